@@ -15,13 +15,15 @@ limitations under the License.
 from __future__ import annotations
 
 import logging
-import traceback
-from typing import TYPE_CHECKING
+import time
+from typing import TYPE_CHECKING, Any
 
 from discord import DMChannel, Guild, Interaction, Message, app_commands, ui
 from discord.ext import commands
 
 from core import FurinaCog, FurinaCtx, settings
+from core.dms import DMDigest
+from core.history import HistoryWriter
 from core.views import LayoutView
 
 if TYPE_CHECKING:
@@ -31,10 +33,43 @@ logger = logging.getLogger(__name__)
 
 
 class BotEvents(FurinaCog):
+    # errors caused by the user, replied to but not reported
+    USER_ERRORS = (
+        commands.UserInputError,
+        commands.CheckFailure,
+        commands.CommandOnCooldown,
+        commands.MaxConcurrencyReached,
+        commands.DisabledCommand,
+    )
+
     def __init__(self, bot: FurinaBot) -> None:
         super().__init__(bot)
         self.pool = bot.pool
         self.bot = bot
+        self.history = HistoryWriter(self.pool, bot.usage)
+        self.dms = DMDigest(bot)
+
+    async def cog_load(self) -> None:
+        self.bot.scheduler.every(
+            "command-history-flush", 0.25, self.history.flush, jitter=0
+        )
+        self.dms.start()
+        await super().cog_load()
+
+    async def cog_unload(self) -> None:
+        self.bot.scheduler.cancel("command-history-flush")
+        await self.history.flush()
+        self.dms.stop()
+        if not self.handing_off:
+            # the REST scheduler is already closed when the bot shuts down
+            await self.dms.digest(background=False)
+
+    def cog_export_state(self) -> dict[str, Any]:
+        return {"known_users": self.history.known_users, "dms": self.dms}
+
+    def cog_import_state(self, state: dict[str, Any]) -> None:
+        self.history.known_users = state["known_users"]
+        self.dms = state["dms"]
 
     @commands.Cog.listener()
     async def on_guild_join(self, guild: Guild) -> None:
@@ -64,24 +99,11 @@ class BotEvents(FurinaCog):
         assert ctx.command is not None
         if ctx.guild is None or "jishaku" in ctx.command.qualified_name:
             return
-        if len(self.bot.command_cache[ctx.guild.id]) == 10:
-            self.bot.command_cache[ctx.guild.id].pop(0)
-        self.bot.command_cache[ctx.guild.id].append(ctx.command.qualified_name)
-        await self.pool.execute(
-            """
-            INSERT OR REPLACE INTO users (id)
-            VALUES (?)
-            """,
-            ctx.author.id,
-        )
-        await self.pool.execute(
-            """
-            INSERT INTO prefix_commands (guild_id, author_id, command)
-            VALUES (?, ?, ?)
-            """,
-            ctx.guild.id,
-            ctx.author.id,
-            ctx.command.qualified_name,
+        now = int(time.time())
+        self.bot.command_cache.add(ctx.guild.id, ctx.command.qualified_name)
+        self.bot.activity.add(ctx.guild.id, now)
+        self.history.add_prefix_command(
+            ctx.guild.id, ctx.author.id, ctx.command.qualified_name, now
         )
 
     @commands.Cog.listener()
@@ -103,30 +125,25 @@ class BotEvents(FurinaCog):
         command : Union[app_commands.Command, app_commands.ContextMenu]
             The completed command (slash and context menu)
         """
-        await self.pool.execute(
-            "INSERT OR REPLACE INTO users (id) VALUES (?)",
-            interaction.user.id,
-        )
-
+        now = int(time.time())
         if interaction.is_user_integration():
+            self.bot.activity.add(None, now)
+            self.history.add_app_command(
+                None, interaction.user.id, command.qualified_name, now
+            )
             return
 
         assert interaction.guild is not None
-        if len(self.bot.app_command_cache[interaction.guild.id]) == 10:
-            self.bot.app_command_cache[interaction.guild.id].pop(0)
-
-        self.bot.app_command_cache[interaction.guild.id].append(
-            command.qualified_name
+        self.bot.app_command_cache.add(
+            interaction.guild.id, command.qualified_name
         )
+        self.bot.activity.add(interaction.guild.id, now)
 
-        await self.pool.execute(
-            """
-            INSERT INTO app_commands (guild_id, author_id, command)
-            VALUES (?, ?, ?)
-            """,
+        self.history.add_app_command(
             interaction.guild.id,
             interaction.user.id,
             command.qualified_name,
+            now,
         )
 
     @commands.Cog.listener()
@@ -134,36 +151,35 @@ class BotEvents(FurinaCog):
         if message.author.bot:
             return
 
-        # Bot's DM will be logged anonymously
+        # Bot's DM will be logged anonymously, in periodic digests
         if isinstance(message.channel, DMChannel):
-            await message.forward(self.bot.get_user(self.bot.owner_id))
+            self.dms.add(message)
 
     @commands.Cog.listener()
     async def on_command_error(
         self, ctx: FurinaCtx, error: commands.errors.CommandError
     ) -> None:
-        err = ""
         if isinstance(error, commands.CommandNotFound):
-            pass
-        elif isinstance(error, commands.MissingRequiredArgument):
-            err += f"""
-            {settings.CROSS} **Missing required argument:** `{error.param.name}`
-            """
-        else:
-            err += f"{settings.CROSS} **{error}**\n"
-            tb = "".join(
-                traceback.format_exception(
-                    type(error), error, error.__traceback__
-                )
+            return
+        if isinstance(error, commands.MissingRequiredArgument):
+            err = (
+                f"{settings.CROSS} **Missing required argument:**"
+                f" `{error.param.name}`"
             )
-            err += f"```py\n{tb}\n```"
-        if err:
-            await ctx.reply(
-                view=LayoutView(ui.Container(ui.TextDisplay(err))),
-                ephemeral=True,
-                delete_after=60,
+        elif isinstance(error, self.USER_ERRORS):
+            err = f"{settings.CROSS} **{error}**"
+        else:
+            command = ctx.command.qualified_name if ctx.command else None
+            group = self.bot.errors.report(error, command=command)
+            err = (
+                f"{settings.CROSS} **{error}**\n"
+                f"-# Reported as `{group.fingerprint}`"
             )
-        logger.error(tb)
+        await ctx.reply(
+            view=LayoutView(ui.Container(ui.TextDisplay(err))),
+            ephemeral=True,
+            delete_after=60,
+        )
 
 
 async def setup(bot: FurinaBot) -> None:
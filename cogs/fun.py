@@ -20,15 +20,18 @@ from pathlib import Path
 from typing import TYPE_CHECKING
 
 import discord
-import numpy as np
 from discord import Interaction, Message, app_commands, ui
 from discord.ext import commands
 
-from core import FurinaCog, FurinaCtx, settings
+from core import FurinaCog, FurinaCtx, settings, utils
 from core.views import LayoutView
 
 if TYPE_CHECKING:
+    import numpy as np
+
     from core import FurinaBot
+else:
+    np = utils.lazy_import("numpy")
 
 
 class Fun(FurinaCog):
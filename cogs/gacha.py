@@ -14,18 +14,23 @@ limitations under the License.
 
 from __future__ import annotations
 
+import asyncio
 from typing import TYPE_CHECKING
 
 import discord
-import enka
 from discord import ui
 from discord.ext import commands
 
-from core import FurinaCog, FurinaCtx
+from core import FurinaCog, FurinaCtx, utils
+from core.governor import governed
 from core.views import LayoutView
 
 if TYPE_CHECKING:
+    import enka
+
     from core import FurinaBot
+else:
+    enka = utils.lazy_import("enka")
 
 
 class NotFoundError(Exception):
@@ -41,15 +46,37 @@ class Gacha(FurinaCog):
 
     def __init__(self, bot: FurinaBot) -> None:
         super().__init__(bot)
-        self.gi = enka.GenshinClient()
-        self.hsr = enka.HSRClient()
+        self._gi: enka.GenshinClient | None = None
+        self._hsr: enka.HSRClient | None = None
+        self._clients_lock = asyncio.Lock()
+
+    async def gi_client(self) -> enka.GenshinClient:
+        """|coro|
 
-    async def cog_load(self) -> None:
-        await self.gi.start()
-        await self.gi.update_assets()
-        await self.hsr.start()
-        await self.hsr.update_assets()
-        await super().cog_load()
+        Get the Genshin Impact client, `enka` and its assets
+        are only loaded the first time this is called
+        """
+        async with self._clients_lock:
+            if self._gi is None:
+                client = enka.GenshinClient()
+                async with client:
+                    await client.update_assets()
+                self._gi = client
+        return self._gi
+
+    async def hsr_client(self) -> enka.HSRClient:
+        """|coro|
+
+        Get the Honkai: Star Rail client, `enka` and its assets
+        are only loaded the first time this is called
+        """
+        async with self._clients_lock:
+            if self._hsr is None:
+                client = enka.HSRClient()
+                async with client:
+                    await client.update_assets()
+                self._hsr = client
+        return self._hsr
 
     async def set_uid(self, sql: str, user_id: int, uid: str) -> None:
         """Insert a user's UID with provided game to the database
@@ -88,6 +115,7 @@ class Gacha(FurinaCog):
         return await self.pool.fetchval(sql, user_id)
 
     @commands.hybrid_group(name="gi", fallback="get")
+    @governed(3)
     async def gi_group(self, ctx: FurinaCtx, uid: str | None = None) -> None:
         """Get Genshin Impact user info
 
@@ -105,7 +133,7 @@ class Gacha(FurinaCog):
                 "SELECT uid FROM gi_uid WHERE user_id = ?", ctx.author.id
             )
 
-        async with self.gi as api:
+        async with await self.gi_client() as api:
             response = await api.fetch_showcase(uid)
             p_info = response.player
         abyss = (
@@ -140,7 +168,7 @@ class Gacha(FurinaCog):
         uid : str
             Your Genshin UID
         """
-        async with self.gi as api:
+        async with await self.gi_client() as api:
             await api.fetch_showcase(uid, info_only=True)
         await self.set_uid(
             "INSERT OR REPLACE INTO gi_uid (user_id, uid) VALUES (?, ?)",
@@ -150,6 +178,7 @@ class Gacha(FurinaCog):
         await ctx.reply("Your GI UID has been set to: " + uid)
 
     @commands.hybrid_group(name="hsr", fallback="get")
+    @governed(3)
     async def hsr_group(self, ctx: FurinaCtx, uid: str | None = None) -> None:
         """Get HSR Impact user info
 
@@ -167,7 +196,7 @@ class Gacha(FurinaCog):
                 "SELECT uid FROM hsr_uid WHERE user_id = ?", ctx.author.id
             )
 
-        async with self.hsr as api:
+        async with await self.hsr_client() as api:
             response = await api.fetch_showcase(uid)
             p_info = response.player
             p_stats = p_info.stats
@@ -196,7 +225,7 @@ class Gacha(FurinaCog):
         uid : str
             Your HSR UID
         """
-        async with self.hsr as api:
+        async with await self.hsr_client() as api:
             await api.fetch_showcase(uid, info_only=True)
         await self.set_uid(
             "INSERT OR REPLACE INTO hsr_uid (user_id, uid) VALUES (?, ?)",
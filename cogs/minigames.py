@@ -19,14 +19,15 @@ import logging
 import pathlib
 import string
 import sys
+import weakref
 from collections import Counter
 from enum import IntEnum
-from typing import TYPE_CHECKING, ClassVar
+from functools import partial
+from typing import TYPE_CHECKING, Any, ClassVar
 
 import aiofiles
 import asqlite
 import discord
-import numpy as np
 from discord import (
     ButtonStyle,
     Color,
@@ -40,12 +41,18 @@ from discord import (
 )
 from discord.ext import commands
 
-from core import settings, utils
-from core.views import LayoutView, PaginatedLayoutView, PaginatedView
+from core import FurinaGroupCog, metrics, settings, utils
+from core.governor import governed
+from core.rest import Priority
+from core.views import LayoutView, Modal, PaginatedLayoutView, PaginatedView
 
 if TYPE_CHECKING:
+    import numpy as np
+
     from core import FurinaBot, FurinaCtx
     from core.sql import SQL
+else:
+    np = utils.lazy_import("numpy")
 
 logger = logging.getLogger(__name__)
 
@@ -367,7 +374,8 @@ class WordleGuessButton(ui.Button):
         view: WordleView = self.view
         modal = view.modal
         await interaction.response.send_modal(modal)
-        await modal.wait()
+        with view.bot.rest.paused():
+            await modal.wait()
         if not modal.guess:
             return
         guess = modal.guess
@@ -463,7 +471,7 @@ class LetterleButton(ui.Button[Letterle]):
         await interaction.response.edit_message(view=view)
 
 
-class WordleModal(ui.Modal):
+class WordleModal(Modal):
     def __init__(
         self, *, letters: int, history: ui.TextDisplay, keyboard: ui.TextDisplay
     ) -> None:
@@ -529,7 +537,7 @@ class WordleHelpGuessSelect(ui.Select):
         await view.process_guess(self.values[0])
 
 
-class Minigames(commands.GroupCog, group_name="minigame"):
+class Minigames(FurinaGroupCog, group_name="minigame"):
     """Some minigames that you can play"""
 
     WORDLE_EMOJIS: ClassVar[dict[str, dict[WordleLetterStatus, str]]]
@@ -539,22 +547,55 @@ class Minigames(commands.GroupCog, group_name="minigame"):
         return discord.PartialEmoji.from_str("\U0001f3ae")
 
     def __init__(self, bot: FurinaBot) -> None:
-        self.bot = bot
+        super().__init__(bot)
         self.emoji_loading_attempts: int = 0
 
         self._randomized_words: list[set[str]] = [set() for _ in range(6)]
+        # games that are still running, finished ones are dropped
+        # once their views are garbage collected
+        self.active_games: weakref.WeakSet[WordleABC] = weakref.WeakSet()
 
     async def cog_load(self) -> None:
-        self.pool = self.bot.pool
-        await self.__update_wordle_emojis()
+        if not hasattr(Minigames, "WORDLE_EMOJIS"):
+            await self.__update_wordle_emojis()
         await self.__insert_valid_guesses()
-        logger.info("Cog %s has been loaded", self.__cog_name__)
+        metrics.ACTIVE_GAMES.set_function(self.__count_active_games)
+        await super().cog_load()
+
+    async def cog_unload(self) -> None:
+        metrics.ACTIVE_GAMES.set_function(None)
+        await super().cog_unload()
+
+    def __count_active_games(self) -> dict[tuple[str, ...], float]:
+        games = Counter(
+            type(game).__name__
+            for game in self.active_games
+            if not game.is_finished()
+        )
+        return {(game,): count for game, count in games.items()}
+
+    def cog_export_state(self) -> dict[str, Any]:
+        return {
+            "randomized_words": self._randomized_words,
+            "wordle_emojis": Minigames.WORDLE_EMOJIS,
+            "active_games": [
+                game for game in self.active_games if not game.is_finished()
+            ],
+        }
+
+    def cog_import_state(self, state: dict[str, Any]) -> None:
+        self._randomized_words = state["randomized_words"]
+        Minigames.WORDLE_EMOJIS = state["wordle_emojis"]
+        for game in state["active_games"]:
+            self.active_games.add(game)
 
     async def get_random_word(self, length: int) -> str:
         index: int = length - 3
         word_set: set[str] = self._randomized_words[index]
         if word_set:
+            metrics.CACHE_LOOKUPS.inc("random_words", "hit")
             return self._randomized_words[index].pop()
+        metrics.CACHE_LOOKUPS.inc("random_words", "miss")
         async with self.bot.cs.get(
             f"https://thanhz.id.vn/api/v0/words?length={length}&count=50"
         ) as response:
@@ -643,7 +684,14 @@ class Minigames(commands.GroupCog, group_name="minigame"):
                 sys.stdout.flush()
             file = filename.read_bytes()
             try:
-                await self.bot.create_application_emoji(name=filename.stem, image=file)
+                await self.bot.rest.call(
+                    partial(
+                        self.bot.create_application_emoji,
+                        name=filename.stem,
+                        image=file,
+                    ),
+                    priority=Priority.LOW,
+                )
             except discord.HTTPException:
                 # This is when the emoji failed to upload
                 # because the emoji name already exists.
@@ -656,6 +704,7 @@ class Minigames(commands.GroupCog, group_name="minigame"):
         return
 
     @commands.hybrid_command(name="wordle")
+    @governed(4)
     @app_commands.allowed_installs(guilds=True, users=True)
     async def wordle(
         self,
@@ -690,9 +739,11 @@ class Minigames(commands.GroupCog, group_name="minigame"):
             solo=solo,
             pool=self.pool,
         )
+        self.active_games.add(view)
         view.message = await ctx.send(view=view)
 
     @commands.hybrid_command(name="letterle")
+    @governed(4)
     @app_commands.allowed_installs(guilds=True, users=True)
     async def letterle(self, ctx: FurinaCtx) -> None:
         """Letterle minigame
@@ -704,12 +755,14 @@ class Minigames(commands.GroupCog, group_name="minigame"):
         rng = np.random.default_rng()
         letter = Letterle.ALPHABET[rng.integers(0, 26)]
         view = Letterle(bot=self.bot, letter=letter, owner=ctx.author, pool=self.pool)
+        self.active_games.add(view)
         view.message = await ctx.send(view=view)
 
     # TODO: Remember to implement this into the minigame commands again
     stats = app_commands.Group(name="stats", description="Minigames stats")
 
     @stats.command(name="all", description="View all minigames stats")
+    @governed(2)
     @app_commands.allowed_installs(guilds=True, users=True)
     async def minigame_stats_all(self, interaction: Interaction) -> None:
         await interaction.response.defer()
@@ -767,6 +820,7 @@ class Minigames(commands.GroupCog, group_name="minigame"):
         view.message = await interaction.original_response()
 
     @stats.command(name="user")
+    @governed(2)
     @app_commands.allowed_installs(guilds=True, users=True)
     async def minigame_stats_user(
         self, interaction: Interaction, user: User | Member | None = None
@@ -813,12 +867,14 @@ class Minigames(commands.GroupCog, group_name="minigame"):
         await interaction.followup.send(embed=embed)
 
     @stats.command(name="wordle", description="View wordle minigame stats")
+    @governed(2)
     @app_commands.allowed_installs(guilds=True, users=True)
     async def minigame_stats_wordle(self, interaction: Interaction) -> None:
         """View wordle minigame stats"""
         await self.get_minigame_stats(interaction, "wordle")
 
     @stats.command(name="letterle", description="View letterle minigame stats")
+    @governed(2)
     @app_commands.allowed_installs(guilds=True, users=True)
     async def minigame_stats_letterle(self, interaction: Interaction) -> None:
         """View letterle minigame stats"""
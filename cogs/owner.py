@@ -0,0 +1,367 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import discord
+from discord import ui
+from discord.ext import commands
+
+from core import FurinaCog, FurinaCtx, settings
+from core.profiler import SamplingProfiler
+from core.views import LayoutView
+
+if TYPE_CHECKING:
+    from core import FurinaBot
+
+
+# room for the rows of a report, Discord caps the text of a message at 4000
+MAX_ROWS_LENGTH = 3500
+
+
+def truncate_rows(rows: str) -> str:
+    """Cut the rows of a report at `MAX_ROWS_LENGTH`, on a line break"""
+    if len(rows) <= MAX_ROWS_LENGTH:
+        return rows
+    return rows[: rows.rfind("\n", 0, MAX_ROWS_LENGTH) + 1] + "...\n"
+
+
+class Owner(FurinaCog):
+    """Owner Only Commands"""
+
+    def __init__(self, bot: FurinaBot) -> None:
+        super().__init__(bot)
+        self._profiling = asyncio.Lock()
+        # tracemalloc snapshots by name, oldest first
+        self._snapshots: dict[str, tracemalloc.Snapshot] = {}
+
+    async def cog_check(self, ctx: FurinaCtx) -> bool:
+        return await self.bot.is_owner(ctx.author)
+
+    @commands.group(name="dev", hidden=True, invoke_without_command=True)
+    async def dev_group(self, ctx: FurinaCtx) -> None:
+        """Owner only diagnostics"""
+        assert isinstance(ctx.command, commands.Group)
+        subcommands = "\n".join(
+            f"- `{command.qualified_name}`: {command.short_doc}"
+            for command in ctx.command.walk_commands()
+        )
+        await ctx.reply(
+            view=LayoutView(ui.Container(ui.TextDisplay(subcommands)))
+        )
+
+    @dev_group.command(name="listeners")
+    async def dev_listeners(
+        self, ctx: FurinaCtx, limit: commands.Range[int, 1, 25] = 15
+    ) -> None:
+        """Show event listeners run time
+
+        Listeners are sorted by their total run time,
+        percentiles are from the latest 256 runs.
+
+        Parameters
+        ----------
+        limit : Range[int, 1, 25], optional
+            How many listeners to show, default is `15`
+        """
+        stats = sorted(
+            self.bot.listener_stats.items(),
+            key=lambda item: item[1].total,
+            reverse=True,
+        )[:limit]
+        if not stats:
+            await ctx.reply("No listeners have run yet")
+            return
+        rows = ""
+        for (event, listener), window in stats:
+            p50, p95, p99 = (
+                q * 1000 for q in window.percentiles(50, 95, 99)
+            )
+            slowest = window.max * 1000
+            rows += (
+                f"{event} | {listener}\n"
+                f"  calls {window.count:>7} | errors {window.errors:>5}"
+                f" | total {window.total:>9.2f}s\n"
+                f"  p50 {p50:>8.2f}ms | p95 {p95:>8.2f}ms"
+                f" | p99 {p99:>8.2f}ms | max {slowest:>8.2f}ms\n"
+            )
+        container = ui.Container(
+            ui.TextDisplay("## Event Listeners"),
+            ui.Separator(),
+            ui.TextDisplay(f"```\n{truncate_rows(rows)}```"),
+        )
+        await ctx.reply(view=LayoutView(container))
+
+    @dev_group.command(name="jobs")
+    async def dev_jobs(self, ctx: FurinaCtx) -> None:
+        """Show background jobs
+
+        Shows runs, failures and skipped runs of every scheduled job,
+        with how long they take and how late they start.
+        """
+        loop = asyncio.get_running_loop()
+        rows = ""
+        for job in self.bot.scheduler.jobs.values():
+            p50, p95 = (q * 1000 for q in job.runtime.percentiles(50, 95))
+            (lag,) = (q * 1000 for q in job.lag.percentiles(95))
+            every = f"every {job.interval:g}s" if job.interval else "once"
+            next_in = max(job.next_run - loop.time(), 0)
+            rows += (
+                f"{job.name} ({every}, next in {next_in:.1f}s)\n"
+                f"  runs {job.runtime.count:>6}"
+                f" | errors {job.runtime.errors:>4}"
+                f" | failing {job.failures:>3} | skipped {job.skipped:>4}\n"
+                f"  p50 {p50:>8.2f}ms | p95 {p95:>8.2f}ms"
+                f" | lag p95 {lag:>8.2f}ms\n"
+            )
+        container = ui.Container(
+            ui.TextDisplay("## Background Jobs"),
+            ui.Separator(),
+            ui.TextDisplay(f"```\n{rows or 'No jobs'}```"),
+        )
+        await ctx.reply(view=LayoutView(container))
+
+    @dev_group.command(name="ratelimits", aliases=["rl"])
+    async def dev_ratelimits(self, ctx: FurinaCtx, limit: int = 15) -> None:
+        """Show Discord API rate limits
+
+        Routes are sorted by their 429 responses, then by how close
+        they are to their limit.
+
+        Parameters
+        ----------
+        limit : int, optional
+            How many routes to show, default is `15`
+        """
+        routes = sorted(
+            self.bot.ratelimits.routes.items(),
+            key=lambda item: (
+                -item[1].ratelimited,
+                item[1].remaining / item[1].limit if item[1].limit else 1,
+            ),
+        )[:limit]
+        now = time.time()
+        rows = ""
+        for route, stats in routes:
+            reset = max(stats.reset_at - now, 0)
+            rows += (
+                f"{route}\n"
+                f"  requests {stats.requests:>6} | 429 {stats.ratelimited:>4}"
+                f" | remaining {stats.remaining:>3}/{stats.limit:<3}"
+                f" | reset {reset:>6.2f}s\n"
+            )
+        rest = self.bot.rest
+        container = ui.Container(
+            ui.TextDisplay("## Rate Limits"),
+            ui.Separator(),
+            ui.TextDisplay(f"```\n{rows or 'No requests yet'}```"),
+            ui.Separator(),
+            ui.TextDisplay(
+                f"Background calls: `{rest.pending}` queued,"
+                f" `{rest.delayed}` delayed, `{rest.forced}` forced"
+            ),
+        )
+        await ctx.reply(view=LayoutView(container))
+
+    @dev_group.command(name="slow")
+    async def dev_slow(self, ctx: FurinaCtx) -> None:
+        """Show the slowest command invocations
+
+        Arguments are redacted, only their names and types are kept.
+        """
+        lines = [
+            f"- `{invocation.seconds * 1000:.0f}ms` `{invocation.command}`"
+            f" in `{invocation.guild_id or 'DM'}` <t:{int(invocation.at)}:R>"
+            f"\n  -# {invocation.arguments or 'no arguments'}"
+            for invocation in self.bot.latencies.slowest()
+        ]
+        container = ui.Container(
+            ui.TextDisplay("## Slowest Commands"),
+            ui.Separator(),
+            ui.TextDisplay("\n".join(lines) or "No commands timed yet"),
+        )
+        await ctx.reply(view=LayoutView(container))
+
+    @dev_group.command(name="profile")
+    async def dev_profile(
+        self, ctx: FurinaCtx, seconds: commands.Range[float, 1, 60] = 10
+    ) -> None:
+        """Profile the event loop
+
+        Samples the event loop thread every 5ms for a while.
+        Sends the top functions and a collapsed stacks file
+        that can be opened with speedscope or `flamegraph.pl`.
+
+        Parameters
+        ----------
+        seconds : Range[float, 1, 60], optional
+            How long to profile for, default is `10`
+        """
+        if self._profiling.locked():
+            await ctx.reply("A profile is already running")
+            return
+        async with self._profiling:
+            await ctx.tick()
+            profiler = SamplingProfiler(threading.get_ident())
+            await asyncio.to_thread(profiler.run, seconds)
+        samples = profiler.samples
+        if not samples:
+            await ctx.reply("No samples were taken")
+            return
+        rows = "\n".join(
+            f"{own / samples:>6.1%} {total / samples:>6.1%}  {label}"
+            for label, own, total in profiler.top_functions()
+        )
+        file = discord.File(
+            io.BytesIO(profiler.collapsed().encode("utf-8")),
+            filename="profile.folded.txt",
+        )
+        container = ui.Container(
+            ui.TextDisplay(f"## Profile ({samples} samples in {seconds:g}s)"),
+            ui.Separator(),
+            ui.TextDisplay(f"```\n  self  total  function\n{rows}```"),
+            ui.File("attachment://profile.folded.txt"),
+        )
+        await ctx.reply(view=LayoutView(container), file=file)
+
+    @dev_group.group(name="mem", invoke_without_command=True)
+    async def dev_mem(self, ctx: FurinaCtx) -> None:
+        """Show tracemalloc status"""
+        if not tracemalloc.is_tracing():
+            await ctx.reply("tracemalloc is not running")
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        snapshots = ", ".join(f"`{name}`" for name in self._snapshots)
+        await ctx.reply(
+            f"Traced: `{current / 1024**2:.2f}MiB`"
+            f" (peak `{peak / 1024**2:.2f}MiB`)\n"
+            f"Snapshots: {snapshots or 'None'}"
+        )
+
+    @dev_mem.command(name="start")
+    async def dev_mem_start(
+        self, ctx: FurinaCtx, frames: commands.Range[int, 1, 25] = 1
+    ) -> None:
+        """Start tracing memory allocations
+
+        Tracing slows down every allocation, stop it when done.
+
+        Parameters
+        ----------
+        frames : Range[int, 1, 25], optional
+            How many frames to keep per allocation, default is `1`
+        """
+        if tracemalloc.is_tracing():
+            await ctx.reply("tracemalloc is already running")
+            return
+        tracemalloc.start(frames)
+        await ctx.tick()
+
+    @dev_mem.command(name="stop")
+    async def dev_mem_stop(self, ctx: FurinaCtx) -> None:
+        """Stop tracing memory allocations and drop the snapshots"""
+        tracemalloc.stop()
+        self._snapshots.clear()
+        await ctx.tick()
+
+    @dev_mem.command(name="snapshot", aliases=["snap"])
+    async def dev_mem_snapshot(self, ctx: FurinaCtx, name: str) -> None:
+        """Take a named snapshot of the traced allocations
+
+        Only the latest 5 snapshots are kept.
+
+        Parameters
+        ----------
+        name : str
+            Name of the snapshot, used by `dev mem diff`
+        """
+        if not tracemalloc.is_tracing():
+            await ctx.reply("Start tracemalloc first with `dev mem start`")
+            return
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(
+                    inclusive=False, filename_pattern=tracemalloc.__file__
+                ),
+                tracemalloc.Filter(
+                    inclusive=False, filename_pattern="<frozen importlib.*>"
+                ),
+            )
+        )
+        self._snapshots.pop(name, None)
+        self._snapshots[name] = snapshot
+        while len(self._snapshots) > 5:
+            del self._snapshots[next(iter(self._snapshots))]
+        await ctx.tick()
+
+    @dev_mem.command(name="diff")
+    async def dev_mem_diff(
+        self,
+        ctx: FurinaCtx,
+        old: str,
+        new: str,
+        limit: commands.Range[int, 1, 25] = 15,
+    ) -> None:
+        """Show the allocation sites that grew the most between snapshots
+
+        Allocations are grouped by file and line.
+
+        Parameters
+        ----------
+        old : str
+            Name of the older snapshot
+        new : str
+            Name of the newer snapshot
+        limit : Range[int, 1, 25], optional
+            How many allocation sites to show, default is `15`
+        """
+        if old not in self._snapshots or new not in self._snapshots:
+            await ctx.reply(f"{settings.CROSS} No snapshot with that name")
+            return
+        stats = await asyncio.to_thread(
+            self._snapshots[new].compare_to, self._snapshots[old], "lineno"
+        )
+        stats.sort(key=lambda stat: stat.size_diff, reverse=True)
+        cwd = str(Path.cwd())
+        rows = ""
+        for stat in stats[:limit]:
+            frame = stat.traceback[0]
+            filename = frame.filename
+            if filename.startswith(cwd):
+                filename = filename[len(cwd) + 1 :]
+            rows += (
+                f"{stat.size_diff / 1024:>+10.1f}KiB {stat.count_diff:>+8}"
+                f" | {stat.size / 1024:>10.1f}KiB  {filename}:{frame.lineno}\n"
+            )
+        total = sum(stat.size_diff for stat in stats) / 1024**2
+        container = ui.Container(
+            ui.TextDisplay(
+                f"## Memory diff `{old}` -> `{new}` ({total:+.2f}MiB)"
+            ),
+            ui.Separator(),
+            ui.TextDisplay(f"```\n{truncate_rows(rows) or 'No changes'}```"),
+        )
+        await ctx.reply(view=LayoutView(container))
+
+
+async def setup(bot: FurinaBot) -> None:
+    await bot.add_cog(Owner(bot))
@@ -16,44 +16,499 @@ from __future__ import annotations
 
 import asyncio
 import datetime
+import heapq
+import itertools
+import logging
+import time
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict
 from pathlib import Path
-from typing import TYPE_CHECKING, cast
+from typing import TYPE_CHECKING, Any, cast
 
 import asqlite
 import discord
 from discord import app_commands, ui
 from discord.ext import commands
 
-from core import FurinaCog, FurinaCtx, settings, utils
+from core import FurinaCog, FurinaCtx, metrics, settings, utils
+from core.autodefer import defer_ephemerally
+from core.bus import TAG_TOPIC
 from core.sql import TagSQL
-from core.views import LayoutView, PaginatedLayoutView, PaginatedView
+from core.views import LayoutView, Modal, PaginatedLayoutView, PaginatedView
 
 if TYPE_CHECKING:
     import sqlite3
+    from collections.abc import Callable, Iterable
 
     from discord import Interaction, Message
 
     from core import FurinaBot
 
+logger = logging.getLogger(__name__)
+
 
 class TagEntry:
-    """Represent a tag"""
+    """Represent a tag, built straight from a `tags` row
+
+    Attributes
+    ----------
+    guild_id : int
+        Guild the tag belongs to
+    owner : int
+        ID of the owner of the tag
+    name : str
+        Name of the tag
+    content : str
+        Content of the tag
+    created_at : int
+        Unix time in milliseconds when the tag was created
+    uses : int
+        How many times the tag was used
+    """
+
+    __slots__ = ("content", "created_at", "guild_id", "name", "owner", "uses")
 
     def __init__(self, data: sqlite3.Row) -> None:
         self.guild_id: int = data["guild_id"]
         self.owner: int = data["owner"]
         self.name: str = data["name"]
         self.content: str = data["content"]
-        self.content_preview: str = ">>> " + self.content[:100]
-        if len(self.content) > 100:
-            self.content_preview += "..."
-        self._raw_created_at: str = data["created_at"]
-        self.created_at: str = utils.format_dt(
-            datetime.datetime.strptime(
-                self._raw_created_at, r"%Y-%m-%d %H:%M:%S.%f%z"
+        self.created_at: int = data["created_at"]
+        self.uses: int = data["uses"]
+
+    @property
+    def content_preview(self) -> str:
+        """The first 100 characters of the content, quoted"""
+        preview = ">>> " + self.content[:100]
+        return preview + "..." if len(self.content) > 100 else preview
+
+    @property
+    def created_at_formatted(self) -> str:
+        """`created_at` as a Discord timestamp"""
+        return utils.format_dt(
+            datetime.datetime.fromtimestamp(
+                self.created_at / 1000, tz=datetime.timezone.utc
             )
         )
-        self.uses: int = data["uses"]
+
+
+def epoch_ms() -> int:
+    """The current unix time in milliseconds, as stored in `created_at`"""
+    return time.time_ns() // 1_000_000
+
+
+def normalize(name: str) -> str:
+    """Key of a tag name or alias in `TagIndex`"""
+    return name.strip("'\" ")
+
+
+def fts_query(text: str) -> str:
+    """Turn user input into an FTS5 query matching every word
+
+    Words are quoted so FTS5 syntax in the input is searched literally,
+    the last one also matches as a prefix.
+    """
+    words = ['"' + word.replace('"', '""') + '"' for word in text.split()]
+    if words:
+        words[-1] += "*"
+    return " ".join(words)
+
+
+class TagRecord:  # ruff: ignore[class-as-data-structure]
+    """A tag as kept in `TagIndex`, updated in place on edits"""
+
+    __slots__ = ("content", "name", "owner", "uses")
+
+    def __init__(self, name: str, owner: int, content: str, uses: int) -> None:
+        self.name = name
+        self.owner = owner
+        self.content = content
+        self.uses = uses
+
+
+class GuildTags:
+    """Tags and aliases of a guild, by normalized name
+
+    Aliases map to the record of their original tag,
+    so editing a tag is seen through all of its aliases.
+    Names are also kept sorted for autocomplete, see `complete`.
+
+    Attributes
+    ----------
+    entries : dict[str, TagRecord]
+        Tags and aliases by normalized name
+    alias_owners : dict[str, int]
+        Owners of the aliases by normalized alias
+    aliases : dict[str, str]
+        Aliases as stored in the database by normalized alias
+    """
+
+    __slots__ = (
+        "_ranked",
+        "_ranked_at",
+        "_sorted",
+        "alias_owners",
+        "aliases",
+        "entries",
+    )
+
+    # prefix matches are ranked directly up to this many,
+    # past it they are picked from the names ranked by uses
+    RANK_DIRECTLY = 500
+    # substring matches are only looked for in this many most used names
+    SUBSTRING_SCAN = 2000
+    # seconds the ranking by uses is kept while tags get used
+    RERANK_EVERY = 60
+
+    def __init__(self) -> None:
+        self.entries: dict[str, TagRecord] = {}
+        self.alias_owners: dict[str, int] = {}
+        self.aliases: dict[str, str] = {}
+        # `(casefolded, name)` sorted, for prefix matches
+        self._sorted: list[tuple[str, str]] = []
+        # `(casefolded, name)` by uses, most used first, `None` until ranked
+        self._ranked: list[tuple[str, str]] | None = None
+        self._ranked_at: float = 0.0
+
+    def __contains__(self, name: str) -> bool:
+        return normalize(name) in self.entries
+
+    def get(self, name: str) -> TagRecord | None:
+        """The tag with this name or alias"""
+        return self.entries.get(normalize(name))
+
+    def stored(self, name: str) -> str | None:
+        """The name or alias as stored in the database
+
+        The database matches names exactly,
+        write through this rather than what the user typed.
+        """
+        key = normalize(name)
+        if key in self.aliases:
+            return self.aliases[key]
+        record = self.entries.get(key)
+        return record.name if record is not None else None
+
+    def load(
+        self,
+        tags: Iterable[tuple[str, int, str, int]],
+        aliases: Iterable[tuple[str, int, str]],
+    ) -> None:
+        """Index the tags and aliases of a guild at once
+
+        Names are sorted once, rather than inserted one by one.
+
+        Parameters
+        ----------
+        tags : Iterable[tuple[str, int, str, int]]
+            Name, owner, content and uses of the tags
+        aliases : Iterable[tuple[str, int, str]]
+            Alias, owner and original name of the aliases
+        """
+        for name, owner, content, uses in tags:
+            self.entries[normalize(name)] = TagRecord(
+                name, owner, content, uses
+            )
+        for alias, owner, original in aliases:
+            record = self.entries.get(normalize(original))
+            if record is not None:
+                self.entries[normalize(alias)] = record
+                self.alias_owners[normalize(alias)] = owner
+                self.aliases[normalize(alias)] = alias
+        self._sorted = sorted((key.casefold(), key) for key in self.entries)
+        self._ranked = None
+
+    def add_tag(
+        self, name: str, owner: int, content: str, uses: int = 0
+    ) -> None:
+        """Index a created tag"""
+        self.__add(normalize(name), TagRecord(name, owner, content, uses))
+
+    def add_alias(self, alias: str, owner: int, original: str) -> None:
+        """Index a created alias of the tag named `original`"""
+        record = self.entries.get(normalize(original))
+        if record is None:
+            return
+        self.__add(normalize(alias), record)
+        self.alias_owners[normalize(alias)] = owner
+        self.aliases[normalize(alias)] = alias
+
+    def remove(self, name: str) -> None:
+        """Remove an alias, or a tag with all of its aliases"""
+        key = normalize(name)
+        record = self.entries.get(key)
+        if record is None:
+            return
+        if key in self.alias_owners:
+            self.__remove(key)
+            return
+        aliases = [
+            alias
+            for alias, aliased in self.entries.items()
+            if aliased is record
+        ]
+        for alias in aliases:
+            self.__remove(alias)
+
+    def used(self, name: str) -> None:
+        """Count a use of a tag"""
+        record = self.get(name)
+        if record is not None:
+            # re-ranked within `RERANK_EVERY` seconds
+            record.uses += 1
+
+    def owner_of(self, name: str) -> int | None:
+        """The owner of a tag, or of an alias"""
+        key = normalize(name)
+        if key in self.alias_owners:
+            return self.alias_owners[key]
+        record = self.entries.get(key)
+        return record.owner if record is not None else None
+
+    def complete(
+        self, current: str, *, owner: int | None = None, limit: int = 25
+    ) -> list[str]:
+        """Names and aliases for autocomplete, case insensitive
+
+        Names starting with `current` come first, then names containing it
+        among the `SUBSTRING_SCAN` most used, each ranked by uses.
+
+        Parameters
+        ----------
+        current : str
+            What the user typed so far
+        owner : int, optional
+            Only suggest the tags and aliases of this user
+        limit : int, optional
+            Suggestions at most, default is `25`
+        """
+        query = normalize(current).casefold()
+        low = bisect_left(self._sorted, (query,))
+        high = bisect_left(self._sorted, (query + "\U0010ffff",))
+        if high - low <= self.RANK_DIRECTLY:
+            prefixed = [
+                name
+                for _, name in self._sorted[low:high]
+                if owner is None or self.owner_of(name) == owner
+            ]
+            matches = heapq.nlargest(
+                limit, prefixed, key=lambda name: self.entries[name].uses
+            )
+        else:
+            matches = self.__ranked_matches(
+                lambda folded: folded.startswith(query), owner, limit
+            )
+        if len(matches) < limit:
+            matches += self.__ranked_matches(
+                lambda folded: query in folded,
+                owner,
+                limit - len(matches),
+                scan=self.SUBSTRING_SCAN,
+                exclude=set(matches),
+            )
+        return matches
+
+    def __ranked_matches(
+        self,
+        match: Callable[[str], bool],
+        owner: int | None,
+        limit: int,
+        *,
+        scan: int | None = None,
+        exclude: set[str] | None = None,
+    ) -> list[str]:
+        now = time.monotonic()
+        if self._ranked is None or now - self._ranked_at > self.RERANK_EVERY:
+            self._ranked = sorted(
+                self._sorted,
+                key=lambda item: self.entries[item[1]].uses,
+                reverse=True,
+            )
+            self._ranked_at = now
+        matches: list[str] = []
+        for folded, name in itertools.islice(self._ranked, scan):
+            if not match(folded) or (exclude and name in exclude):
+                continue
+            if owner is not None and self.owner_of(name) != owner:
+                continue
+            matches.append(name)
+            if len(matches) >= limit:
+                break
+        return matches
+
+    def __add(self, key: str, record: TagRecord) -> None:
+        if key in self.entries:
+            self.__remove(key)
+        self.entries[key] = record
+        item = (key.casefold(), key)
+        insort(self._sorted, item)
+        if self._ranked is not None:
+            # ranked last until the next re-rank
+            self._ranked.append(item)
+
+    def __remove(self, key: str) -> None:
+        del self.entries[key]
+        self.alias_owners.pop(key, None)
+        self.aliases.pop(key, None)
+        item = (key.casefold(), key)
+        index = bisect_left(self._sorted, item)
+        if index < len(self._sorted) and self._sorted[index] == item:
+            del self._sorted[index]
+        if self._ranked is not None:
+            self._ranked.remove(item)
+
+
+class TagIndex:
+    """Tags of the most recently used guilds, kept in memory
+
+    The tags of a guild are loaded on first use. Past `max_guilds` guilds,
+    the least recently used ones are dropped. Commands changing tags
+    update the loaded guilds through `for_update`.
+
+    Attributes
+    ----------
+    pool : TagSQL
+        The database holding the tags
+    max_guilds : int
+        Guilds kept at most
+    """
+
+    def __init__(self, pool: TagSQL, *, max_guilds: int = 500) -> None:
+        self.pool = pool
+        self.max_guilds = max_guilds
+        # least recently used guild first
+        self._guilds: OrderedDict[int, GuildTags] = OrderedDict()
+        # bumped on every change, loads racing a change are not kept
+        self._version: int = 0
+
+    async def get(self, guild_id: int) -> GuildTags:
+        """|coro|
+
+        The tags of a guild, loading them if needed
+        """
+        guild = self._guilds.get(guild_id)
+        if guild is not None:
+            self._guilds.move_to_end(guild_id)
+            metrics.CACHE_LOOKUPS.inc("tags", "hit")
+            return guild
+        metrics.CACHE_LOOKUPS.inc("tags", "miss")
+        version = self._version
+        guild = await self.__load(guild_id)
+        if version == self._version:
+            self._guilds[guild_id] = guild
+            while len(self._guilds) > self.max_guilds:
+                self._guilds.popitem(last=False)
+        return guild
+
+    def for_update(self, guild_id: int) -> GuildTags | None:
+        """The loaded tags of a guild whose tags are being changed
+
+        Returns
+        -------
+        GuildTags, optional
+            The tags to update, `None` if the guild is not loaded
+        """
+        self._version += 1
+        return self._guilds.get(guild_id)
+
+    def invalidate(self, guild_id: int) -> None:
+        """Drop the tags of a guild, they are loaded again on next use"""
+        self._version += 1
+        self._guilds.pop(guild_id, None)
+
+    async def __load(self, guild_id: int) -> GuildTags:
+        tags = await self.pool.fetchall(
+            """
+            SELECT name, owner, content, COALESCE(uses, 0) FROM tags
+            WHERE guild_id = ?
+            """,
+            guild_id,
+        )
+        aliases = await self.pool.fetchall(
+            """SELECT alias, owner, name FROM tag_aliases WHERE guild_id = ?""",
+            guild_id,
+        )
+        guild = GuildTags()
+        guild.load(tags, aliases)
+        return guild
+
+
+class TagUses:
+    """Tag uses counted in memory and written in batches
+
+    `flush` writes every counted use with one `executemany` per table.
+    A use through an alias is credited to both the alias and its tag.
+
+    Attributes
+    ----------
+    pool : TagSQL
+        The database holding the tags
+    """
+
+    def __init__(self, pool: TagSQL) -> None:
+        self.pool = pool
+        self._tags: Counter[tuple[int, str]] = Counter()
+        self._aliases: Counter[tuple[int, str]] = Counter()
+        # the write in flight, shielded so cancelling a flush loses no uses
+        self._writing: asyncio.Task[None] | None = None
+
+    @property
+    def pending(self) -> int:
+        """Uses not written yet"""
+        return self._tags.total()
+
+    def add(
+        self, guild_id: int, name: str, *, alias: str | None = None
+    ) -> None:
+        """Count a use of the tag `name`, through `alias` if given"""
+        self._tags[guild_id, name] += 1
+        if alias is not None:
+            self._aliases[guild_id, alias] += 1
+
+    async def flush(self) -> None:
+        """|coro|
+
+        Write the counted uses
+
+        Cancelling it leaves the write running,
+        the next flush waits for it first.
+        """
+        if self._writing is not None and not self._writing.done():
+            await asyncio.shield(self._writing)
+        if not self._tags:
+            return
+        tags, self._tags = self._tags, Counter()
+        aliases, self._aliases = self._aliases, Counter()
+        self._writing = asyncio.create_task(self.__write(tags, aliases))
+        await asyncio.shield(self._writing)
+
+    async def __write(
+        self,
+        tags: Counter[tuple[int, str]],
+        aliases: Counter[tuple[int, str]],
+    ) -> None:
+        try:
+            await self.pool.executebatch(
+                (
+                    """
+                    UPDATE tags SET uses = uses + ?
+                    WHERE guild_id = ? AND name = ?
+                    """,
+                    [(uses, *key) for key, uses in tags.items()],
+                ),
+                (
+                    """
+                    UPDATE tag_aliases SET uses = uses + ?
+                    WHERE guild_id = ? AND alias = ?
+                    """,
+                    [(uses, *key) for key, uses in aliases.items()],
+                ),
+            )
+        except Exception:
+            # counted again with the next flush
+            self._tags.update(tags)
+            self._aliases.update(aliases)
+            logger.exception("Failed to write %d tag uses", tags.total())
 
 
 class TagCreateLayoutView(LayoutView):
@@ -89,7 +544,7 @@ class TagCreateLayoutView(LayoutView):
     async def insert_tag(self, *, guild_id: int, owner: int) -> None:
         assert self.name is not None
         assert self.content is not None
-        await self._cog.__insert_tag(
+        await self._cog.insert_tag(
             guild_id=guild_id, owner=owner, name=self.name, content=self.content
         )
 
@@ -113,7 +568,8 @@ class TagCreateActionRow(ui.ActionRow):
             name=self.name, content=self.content, cog=self.cog
         )
         await interaction.response.send_modal(modal)
-        await modal.wait()
+        with self.cog.bot.rest.paused():
+            await modal.wait()
         self.view.message = None
 
     @ui.button(label="Create", emoji="\U00002705")
@@ -137,7 +593,7 @@ class TagCreateActionRow(ui.ActionRow):
             await interaction.delete_original_response()
 
 
-class TagCreateModal(ui.Modal, title="Create A Tag"):
+class TagCreateModal(Modal, title="Create A Tag"):
     """Modal for creating a tag"""
 
     def __init__(
@@ -180,19 +636,46 @@ class Tags(FurinaCog):
         return discord.PartialEmoji.from_str("\U0001f3f7\U0000fe0f")
 
     async def cog_load(self) -> None:
-        self.pool: TagSQL = TagSQL(
-            await asqlite.create_pool(str(Path() / "db" / "tags.db"))
+        if not isinstance(self.pool, TagSQL):
+            self.pool: TagSQL = TagSQL(
+                await asqlite.create_pool(str(Path() / "db" / "tags.db"))
+            )
+            await self.pool.create_tables()
+            self.index = TagIndex(self.pool)
+            self.uses = TagUses(self.pool)
+        self.bot.scheduler.every("tag-uses-flush", 5, self.uses.flush)
+        # tag names can not start with these
+        self.reserved_names = tuple(
+            command.name
+            for command in self.walk_commands()
+            if command.qualified_name.startswith("tag")
         )
-        await self.pool.create_tables()
+        self.bot.bus.subscribe(TAG_TOPIC, self.__on_tags_changed)
         return await super().cog_load()
 
     async def cog_unload(self) -> None:
-        await self.pool.pool.close()
+        self.bot.bus.unsubscribe(TAG_TOPIC, self.__on_tags_changed)
+        self.bot.scheduler.cancel("tag-uses-flush")
+        if not self.handing_off:
+            await self.uses.flush()
+            await self.pool.pool.close()
+
+    def cog_export_state(self) -> dict[str, Any]:
+        return {"pool": self.pool, "index": self.index, "uses": self.uses}
+
+    def cog_import_state(self, state: dict[str, Any]) -> None:
+        self.pool = state["pool"]
+        self.index = state["index"]
+        self.uses = state["uses"]
+
+    async def __on_tags_changed(self, guild_id: str) -> None:
+        """Drop the tags of a guild changed by another process"""
+        self.index.invalidate(int(guild_id))
 
     async def __get_tag_content(
         self, *, guild_id: int, name: str
     ) -> str | None:
-        """Get tag content from database
+        """Get tag content from `index`
 
         Parameters
         ----------
@@ -206,15 +689,50 @@ class Tags(FurinaCog):
         str, optional
             Tag content if it exists, else `None`
         """
-        return await self.pool.fetchval(
+        tag = (await self.index.get(guild_id)).get(name)
+        return tag.content if tag is not None else None
+
+    async def __resolve(
+        self, *, guild_id: int, name: str
+    ) -> sqlite3.Row | None:
+        """|coro|
+        Get a tag, or an alias with the content of its tag
+
+        Tag names and aliases are both unique in a guild and aliases always
+        point to a tag, so this is one primary key or `tag_aliases_alias`
+        lookup. `name` is looked up as stored, see `GuildTags.stored`.
+
+        Parameters
+        ----------
+        guild_id : int
+            Guild ID that is fetching the tag
+        name : str
+            Name or alias of the tag
+
+        Returns
+        -------
+        sqlite3.Row, optional
+            The tag, or the alias with its `alias` column set.
+            Owner and uses are the alias ones for an alias.
+        """
+        name = (await self.index.get(guild_id)).stored(name) or name
+        return await self.pool.fetchone(
             """
-            SELECT T.content FROM tags T
-            LEFT JOIN tag_aliases TA
-            ON T.guild_id = TA.guild_id AND T.name = TA.name
-            WHERE T.guild_id = ? AND (T.name = ? OR TA.alias = ?)
+            SELECT guild_id, name, owner, content, created_at, uses,
+                NULL AS alias
+            FROM tags
+            WHERE guild_id = ? AND name = ?
+            UNION ALL
+            SELECT ta.guild_id, ta.name, ta.owner, t.content, ta.created_at,
+                ta.uses, ta.alias
+            FROM tag_aliases ta
+            JOIN tags t ON t.guild_id = ta.guild_id AND t.name = ta.name
+            WHERE ta.guild_id = ? AND ta.alias = ?
+            LIMIT 1
             """,
             guild_id,
             name,
+            guild_id,
             name,
         )
 
@@ -236,7 +754,10 @@ class Tags(FurinaCog):
 
         try:
             await ctx.send(prompt)
-            msg = await self.bot.wait_for("message", check=check, timeout=180)
+            with self.bot.rest.paused():
+                msg = await self.bot.wait_for(
+                    "message", check=check, timeout=180
+                )
             if msg.content.lower() == "cancel":
                 await ctx.send("Tag creation cancelled")
                 return None
@@ -260,19 +781,10 @@ class Tags(FurinaCog):
         bool
             Whether the tag exists or not
         """
-        # list of reserved tag names
-        reserved = [
-            command.name
-            for command in self.walk_commands()
-            if command.qualified_name.startswith("tag")
-        ]
         # True if tag name starts with reserved names
-        if name.startswith(tuple(reserved)):
+        if name.startswith(self.reserved_names):
             return True
-        # None -> Tag does not exist
-        fetched = await self.__get_tag_content(guild_id=guild_id, name=name)
-        in_fetched = fetched is not None
-        return bool(in_fetched)
+        return name in await self.index.get(guild_id)
 
     async def __handle_tag_creation_prefix(
         self,
@@ -314,7 +826,7 @@ class Tags(FurinaCog):
             if not content:
                 return
         # tag create <name> <content>
-        await self.__insert_tag(
+        await self.insert_tag(
             guild_id=ctx.guild.id,
             owner=ctx.author.id,
             name=name,
@@ -341,14 +853,15 @@ class Tags(FurinaCog):
         content : str, optional
             Content of the tag
         """
-        await interaction.response.defer(ephemeral=True)
+        if not interaction.response.is_done():
+            await interaction.response.defer(ephemeral=True)
         assert interaction.guild_id is not None
         if (
             name
             and content
             and not await self.__check_tag_name(interaction.guild_id, name=name)
         ):
-            await self.__insert_tag(
+            await self.insert_tag(
                 guild_id=interaction.guild_id,
                 owner=interaction.user.id,
                 name=name,
@@ -358,7 +871,7 @@ class Tags(FurinaCog):
         view = TagCreateLayoutView(name=name, content=content, cog=self)
         view.message = await interaction.followup.send(view=view)
 
-    async def __insert_tag(
+    async def insert_tag(
         self, *, guild_id: int, owner: int, name: str, content: str
     ) -> None:
         """|coro|
@@ -384,8 +897,11 @@ class Tags(FurinaCog):
             owner,
             name,
             content,
-            str(utils.utcnow()),
+            epoch_ms(),
         )
+        if (tags := self.index.for_update(guild_id)) is not None:
+            tags.add_tag(name, owner, content)
+        await self.bot.bus.publish(TAG_TOPIC, guild_id)
 
     @commands.hybrid_group(name="tag", fallback="get")
     async def tag_group(self, ctx: FurinaCtx, *, name: str) -> None:
@@ -402,23 +918,19 @@ class Tags(FurinaCog):
             Name of the tag
         """
         assert ctx.guild is not None
-        tag_content = await self.__get_tag_content(
-            guild_id=ctx.guild.id, name=name
-        )
-        if not tag_content:
+        tags = await self.index.get(ctx.guild.id)
+        tag = tags.get(name)
+        if tag is None:
             await ctx.send(f"No tags found for query: `{name}`")
         else:
-            await self.pool.execute(
-                """
-                UPDATE tags
-                SET uses = uses + 1
-                WHERE guild_id = ? AND name = ?
-                """,
+            self.uses.add(
                 ctx.guild.id,
-                name,
+                tag.name,
+                alias=tags.aliases.get(normalize(name)),
             )
+            tags.used(name)
             await ctx.send(
-                tag_content,
+                tag.content,
                 reference=ctx.message.reference,
                 allowed_mentions=discord.AllowedMentions(replied_user=True),
             )  # ty: ignore[no-matching-overload]
@@ -427,28 +939,15 @@ class Tags(FurinaCog):
     async def tag_name_autocomplete(
         self, interaction: Interaction, current: str
     ) -> list[app_commands.Choice]:
-        rows = await self.pool.fetchall(
-            """
-            SELECT T.name FROM tags T
-            LEFT JOIN tag_aliases TA
-                ON T.guild_id = TA.guild_id
-                AND T.name = TA.name
-            WHERE T.guild_id = ?
-                AND (
-                    instr(T.name, ?) > 0 OR instr(TA.alias, ?)
-                )
-            LIMIT 25
-            """,
-            interaction.guild_id,
-            current,
-            current,
-        )
+        assert interaction.guild_id is not None
+        tags = await self.index.get(interaction.guild_id)
         return [
-            app_commands.Choice(name=row["name"], value=row["name"])
-            for row in rows
+            app_commands.Choice(name=name, value=name)
+            for name in tags.complete(current)
         ]
 
     @tag_group.command(name="create")
+    @defer_ephemerally
     async def tag_create_command(
         self,
         ctx: FurinaCtx,
@@ -475,9 +974,8 @@ class Tags(FurinaCog):
                 ctx, name=name, content=content
             )
         else:
-            ctx: Interaction = cast("Interaction", ctx)
             await self.__handle_tag_creation_slash(
-                ctx, name=name, content=content
+                ctx.interaction, name=name, content=content
             )
 
     @tag_group.command(name="edit")
@@ -498,16 +996,12 @@ class Tags(FurinaCog):
             The new content of the tag
         """
         assert ctx.guild is not None
-        tag_owner = await self.pool.fetchval(
-            """
-            SELECT owner FROM tags
-            WHERE guild_id = ? AND name = ? AND owner = ?
-            """,
-            ctx.guild.id,
-            name,
-            ctx.author.id,
-        )
-        if tag_owner is not None:
+        tag = await self.__resolve(guild_id=ctx.guild.id, name=name)
+        if tag is None or tag["owner"] != ctx.author.id:
+            await ctx.reply("Failed to edit the tag, is the tag even exist?")
+            return
+        name = tag["alias"] or tag["name"]
+        if tag["alias"] is None:
             await self.pool.execute(
                 """
                 UPDATE tags
@@ -518,62 +1012,40 @@ class Tags(FurinaCog):
                 ctx.guild.id,
                 name,
             )
+            if (tags := self.index.for_update(ctx.guild.id)) is not None:
+                record = tags.get(name)
+                if record is not None:
+                    record.content = content
+            await self.bot.bus.publish(TAG_TOPIC, ctx.guild.id)
             await ctx.reply(f"Updated tag `{name}`")
             return
-        tag_alias_owner = await self.pool.fetchval(
+        await self.pool.execute(
             """
-            SELECT owner
-            FROM tag_aliases
-            WHERE guild_id = ? AND alias = ? AND owner = ?
+            DELETE FROM tag_aliases
+            WHERE guild_id = ? AND alias = ?
             """,
             ctx.guild.id,
             name,
-            ctx.author.id,
         )
-        if tag_alias_owner is not None:
-            await self.pool.execute(
-                """
-                DELETE FROM tag_aliases
-                WHERE guild_id = ? AND alias = ?
-                """,
-                ctx.guild.id,
-                name,
-            )
-            await self.__insert_tag(
-                guild_id=ctx.guild.id,
-                owner=ctx.author.id,
-                name=name,
-                content=content,
-            )
-            await ctx.reply(f"Updated tag `{name}`")
-            return
-        await ctx.reply("Failed to edit the tag, is the tag even exist?")
+        if (tags := self.index.for_update(ctx.guild.id)) is not None:
+            tags.remove(name)
+        await self.insert_tag(
+            guild_id=ctx.guild.id,
+            owner=ctx.author.id,
+            name=name,
+            content=content,
+        )
+        await ctx.reply(f"Updated tag `{name}`")
 
     @tag_edit_command.autocomplete(name="name")
     async def owned_tag_name_autocomplete(
         self, interaction: Interaction, current: str
     ) -> list[app_commands.Choice]:
-        rows = await self.pool.fetchall(
-            """
-            SELECT T.name FROM tags T
-            LEFT JOIN tag_aliases TA
-                ON T.guild_id = TA.guild_id
-                AND T.name = TA.name
-            WHERE T.guild_id = ?
-                AND T.owner = ?
-                AND (
-                    instr(T.name, ?) > 0 OR instr(TA.alias, ?)
-                )
-            LIMIT 25
-            """,
-            interaction.guild_id,
-            interaction.user.id,
-            current,
-            current,
-        )
+        assert interaction.guild_id is not None
+        tags = await self.index.get(interaction.guild_id)
         return [
-            app_commands.Choice(name=row["name"], value=row["name"])
-            for row in rows
+            app_commands.Choice(name=name, value=name)
+            for name in tags.complete(current, owner=interaction.user.id)
         ]
 
     @tag_group.command(name="delete", aliases=["del"])
@@ -592,7 +1064,7 @@ class Tags(FurinaCog):
         """
         assert ctx.guild is not None
         ctx.author: discord.Member = cast("discord.Member", ctx.author)
-        name = name.replace('"', "").replace("'", "")
+        name = (await self.index.get(ctx.guild.id)).stored(name) or name
         if ctx.author.guild_permissions.manage_guild:
             result = await self.__force_delete_tag(
                 guild_id=ctx.guild.id, name=name
@@ -619,6 +1091,7 @@ class Tags(FurinaCog):
                 """
                 DELETE FROM tag_aliases
                 WHERE guild_id = ? AND alias = ?
+                RETURNING *
                 """,
                 guild_id,
                 name,
@@ -634,21 +1107,17 @@ class Tags(FurinaCog):
             )
         if deleted is None:
             return f"No tags or aliases with query `{name}` for deletion"
+        if (tags := self.index.for_update(guild_id)) is not None:
+            tags.remove(name)
+        await self.bot.bus.publish(TAG_TOPIC, guild_id)
         return f"Deleted tag `{name}`!"
 
     async def __delete_tag(
         self, *, guild_id: int, owner: int, name: str
     ) -> str:
         """Check if the user is the owner of the tag and force delete it"""
-        tag_owner = await self.pool.fetchval(
-            """
-            SELECT owner FROM tags
-            WHERE guild_id = ? AND name = ?
-            """,
-            guild_id,
-            name,
-        )
-        if tag_owner != owner:
+        tag = await self.__resolve(guild_id=guild_id, name=name)
+        if tag is None or tag["alias"] is not None or tag["owner"] != owner:
             return "You do not own this tag!"
         return await self.__force_delete_tag(guild_id=guild_id, name=name)
 
@@ -676,14 +1145,14 @@ class Tags(FurinaCog):
         if check_alias_exist:
             await ctx.send(f"Tag `{alias}` already exists")
             return
-        check_name_exist = await self.__check_tag_name(
-            ctx.guild.id, name=original
-        )
-        if not check_name_exist:
+        tag = (await self.index.get(ctx.guild.id)).get(original)
+        if tag is None:
             await ctx.send(
                 f"Cannot create alias for non-existent tag `{original}`"
             )
             return
+        # an alias of an alias points to the tag, so aliases are single hop
+        original = tag.name
         await self.pool.execute(
             """
             INSERT INTO tag_aliases (guild_id, owner, name, alias, created_at)
@@ -693,8 +1162,11 @@ class Tags(FurinaCog):
             ctx.author.id,
             original,
             alias,
-            str(utils.utcnow()),
+            epoch_ms(),
         )
+        if (tags := self.index.for_update(ctx.guild.id)) is not None:
+            tags.add_alias(alias, ctx.author.id, original)
+        await self.bot.bus.publish(TAG_TOPIC, ctx.guild.id)
         await ctx.reply(
             f"Successfully created tag alias `{alias}` for `{original}`"
         )
@@ -710,25 +1182,7 @@ class Tags(FurinaCog):
         """
         assert ctx.guild is not None
         name = name.strip("'\"")
-        fetched = await self.pool.fetchone(
-            """
-            SELECT t.guild_id, t.name, t.content, t.owner, t.created_at, t.uses
-            FROM tags t
-            WHERE t.name = ? and t.guild_id = ?
-            UNION
-            SELECT
-            ta.guild_id, ta.name, t.content, ta.owner, ta.created_at, ta.uses
-            FROM tags t
-            JOIN tag_aliases ta
-            ON t.guild_id = ta.guild_id and t.name = ta.name
-            WHERE t.guild_id = ? AND (t.name = ? OR ta.alias = ?)
-            """,
-            name,
-            ctx.guild.id,
-            ctx.guild.id,
-            name,
-            name,
-        )
+        fetched = await self.__resolve(guild_id=ctx.guild.id, name=name)
         if fetched is None:
             await ctx.send(f"No tags found for query: `{name}`")
             return
@@ -743,7 +1197,8 @@ class Tags(FurinaCog):
         section = ui.Section(
             f"### {tag.name}\n",
             f"{tag.content_preview}\n",
-            f"{info_owner}\nCreated at: {tag.created_at}\nUses: {tag.uses}\n",
+            f"{info_owner}\nCreated at: {tag.created_at_formatted}\n"
+            f"Uses: {tag.uses}\n",
             accessory=ui.Thumbnail(avatar),
         )
         await ctx.reply(view=LayoutView(ui.Container(section)))
@@ -843,6 +1298,63 @@ class Tags(FurinaCog):
         view = PaginatedLayoutView(containers=containers)
         view.message = await ctx.reply(view=view)
 
+    @tag_group.command(name="search")
+    async def tag_search(self, ctx: FurinaCtx, *, query: str) -> None:
+        """Search the server tags by content
+
+        Tags are ranked by relevance, names count more than contents.
+        Shows up to 50 tags.
+
+        Parameters
+        ----------
+        query : str
+            Words to search for
+        """
+        assert ctx.guild is not None
+        match = fts_query(query)
+        if not match:
+            await ctx.reply(f"{settings.CROSS} Nothing to search for")
+            return
+        # only this guild's postings are matched, the words only against
+        # the names and contents
+        match = f'guild_id : "{ctx.guild.id}" AND {{name content}} : ({match})'
+        rows = await self.pool.fetchall(
+            """
+            SELECT
+                t.name,
+                snippet(tags_fts, 2, '**', '**', '...', 16) AS snippet
+            FROM tags_fts
+            JOIN tags t ON t.rowid = tags_fts.rowid
+            WHERE tags_fts MATCH ?
+            ORDER BY bm25(tags_fts, 0.0, 2.0, 1.0)
+            LIMIT 50
+            """,
+            match,
+        )
+        if not rows:
+            await ctx.reply(
+                view=LayoutView(
+                    ui.Container(
+                        ui.TextDisplay(
+                            f"{settings.CROSS} No tags found for query:"
+                            f" `{query}`"
+                        )
+                    )
+                )
+            )
+            return
+        header = f"### Tags matching: {query[:100]}\n"
+        results = [
+            f"- **{row['name']}**\n  " + row["snippet"].replace("\n", " ")
+            for row in rows
+        ]
+        containers = [
+            ui.Container(ui.TextDisplay(header + "\n".join(results[i : i + 5])))
+            for i in range(0, len(results), 5)
+        ]
+        view = PaginatedLayoutView(containers=containers)
+        view.message = await ctx.reply(view=view)
+
     @tag_group.command(name="raw")
     async def tag_raw_command(self, ctx: FurinaCtx, *, name: str) -> None:
         """Get the raw content of the tag
@@ -866,45 +1378,6 @@ class Tags(FurinaCog):
         else:
             await ctx.send(utils.escape_markdown(tag_content))
 
-    async def _get_tag_owner_id(
-        self, *, name: str, guild_id: int
-    ) -> int | None:
-        """Gets the owner of the tag with given name
-
-        Returns
-        -------
-        int
-            The tag owner ID
-        None
-            No tags with given name found
-        """
-        return await self.pool.fetchval(
-            """SELECT owner FROM tags WHERE name = ? AND guild_id = ?""",
-            name,
-            guild_id,
-        )
-
-    async def _get_tag_alias_owner_id(
-        self, *, alias: str, guild_id: int
-    ) -> int | None:
-        """Gets the owner of the alias
-
-        Returns
-        -------
-        int
-            The tag owner ID
-        None
-            No tag aliases found
-        """
-        return await self.pool.fetchval(
-            """
-            SELECT owner FROM tag_aliases
-            WHERE alias = ? AND guild_id = ?
-            """,
-            alias,
-            guild_id,
-        )
-
     async def _update_tag_owner(
         self, *, new_owner: int, guild_id: int, name: str
     ) -> None:
@@ -918,6 +1391,11 @@ class Tags(FurinaCog):
             guild_id,
             name,
         )
+        if (tags := self.index.for_update(guild_id)) is not None:
+            tag = tags.get(name)
+            if tag is not None:
+                tag.owner = new_owner
+        await self.bot.bus.publish(TAG_TOPIC, guild_id)
 
     async def _update_tag_alias_owner(
         self, *, new_owner: int, guild_id: int, alias: str
@@ -932,6 +1410,9 @@ class Tags(FurinaCog):
             guild_id,
             alias,
         )
+        if (tags := self.index.for_update(guild_id)) is not None:
+            tags.alias_owners[normalize(alias)] = new_owner
+        await self.bot.bus.publish(TAG_TOPIC, guild_id)
 
     @tag_group.command(name="claim")
     async def tag_claim_command(self, ctx: FurinaCtx, *, name: str) -> None:
@@ -945,31 +1426,23 @@ class Tags(FurinaCog):
             The name of the tag you want to claim
         """
         assert ctx.guild is not None
-        tag_owner = await self._get_tag_owner_id(
-            name=name, guild_id=ctx.guild.id
-        )
-        if tag_owner is not None:
-            if ctx.guild.get_member(tag_owner):
-                await ctx.send("The tag owner is still in the server")
-                return
+        tag = await self.__resolve(guild_id=ctx.guild.id, name=name)
+        if tag is None:
+            await ctx.send(f"Tag named `{name}` doesn't exists.")
+            return
+        if ctx.guild.get_member(tag["owner"]):
+            await ctx.send("The tag owner is still in the server")
+            return
+        name = tag["alias"] or tag["name"]
+        if tag["alias"] is None:
             await self._update_tag_owner(
                 new_owner=ctx.author.id, guild_id=ctx.guild.id, name=name
             )
-            await ctx.send(f"Claimed tag `{name}`!")
-            return
-        tag_alias_owner = await self._get_tag_alias_owner_id(
-            alias=name, guild_id=ctx.guild.id
-        )
-        if tag_alias_owner is not None:
-            if ctx.guild.get_member(tag_alias_owner):
-                await ctx.send("The tag owner is still in the server")
-                return
+        else:
             await self._update_tag_alias_owner(
                 new_owner=ctx.author.id, guild_id=ctx.guild.id, alias=name
             )
-            await ctx.send(f"Claimed tag `{name}`!")
-            return
-        await ctx.send(f"Tag named `{name}` doesn't exists.")
+        await ctx.send(f"Claimed tag `{name}`!")
 
     @tag_group.command(name="transfer")
     async def tag_transfer_command(
@@ -987,29 +1460,26 @@ class Tags(FurinaCog):
             The name of the tag being transferred
         """
         assert ctx.guild is not None
-        message = f"Tag `{name}` not found or not yours"
-        if (
-            await self._get_tag_owner_id(name=name, guild_id=ctx.guild.id)
-            == ctx.author.id
-        ):
+        tag = await self.__resolve(guild_id=ctx.guild.id, name=name)
+        if tag is None or tag["owner"] != ctx.author.id:
+            await ctx.send(f"Tag `{name}` not found or not yours")
+            return
+        name = tag["alias"] or tag["name"]
+        if tag["alias"] is None:
             await self._update_tag_owner(
                 new_owner=member.id, guild_id=ctx.guild.id, name=name
             )
             message = (
                 f"Transferred ownership of tag `{name}` to {member.mention}"
             )
-        elif (
-            await self._get_tag_alias_owner_id(
-                alias=name, guild_id=ctx.guild.id
-            )
-            == ctx.author.id
-        ):
+        else:
             await self._update_tag_alias_owner(
                 new_owner=member.id, guild_id=ctx.guild.id, alias=name
             )
-            message = f"""
-            Transferred ownership of tag alias `{name}` to {member.mention}
-            """
+            message = (
+                f"Transferred ownership of tag alias `{name}`"
+                f" to {member.mention}"
+            )
         await ctx.send(message)
 
 
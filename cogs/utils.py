@@ -20,21 +20,28 @@ import io
 import re
 from itertools import groupby
 from time import perf_counter
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Literal
 
 import anyio
-import dateparser
 import discord
-import docstring_parser
 from discord import Member, app_commands, ui
 from discord.ext import commands
 from discord.ui import Select
 
 from core import FurinaCog, FurinaCtx, settings, utils
+from core.bus import PREFIX_TOPIC
+from core.governor import governed
+from core.stats import sparkline
 from core.views import LayoutView
 
 if TYPE_CHECKING:
+    import dateparser
+    import docstring_parser
+
     from core import FurinaBot
+else:
+    dateparser = utils.lazy_import("dateparser")
+    docstring_parser = utils.lazy_import("docstring_parser")
 
 
 class HelpActionRow(ui.ActionRow):
@@ -84,10 +91,12 @@ class Utils(FurinaCog):
         self.bot._help_bak: commands.HelpCommand = self.bot.help_command
         self.bot.help_command = None
         await self.__update_custom_prefixes()
+        self.bot.bus.subscribe(PREFIX_TOPIC, self.__on_prefix_changed)
         return await super().cog_load()
 
     async def cog_unload(self) -> None:
         self.bot.help_command = self.bot._help_bak
+        self.bot.bus.unsubscribe(PREFIX_TOPIC, self.__on_prefix_changed)
         return await super().cog_unload()
 
     async def __update_custom_prefixes(self) -> None:
@@ -97,6 +106,17 @@ class Utils(FurinaCog):
             prefix["guild_id"]: prefix["prefix"] for prefix in prefixes
         }
 
+    async def __on_prefix_changed(self, guild_id: str) -> None:
+        """Refetch the custom prefix of a guild changed by another process"""
+        prefix = await self.pool.fetchval(
+            """SELECT prefix FROM custom_prefixes WHERE guild_id = ?""",
+            int(guild_id),
+        )
+        if prefix is None:
+            self.bot.prefixes.pop(int(guild_id), None)
+        else:
+            self.bot.prefixes[int(guild_id)] = prefix
+
     @staticmethod
     def list_cog_commands(*, cog: FurinaCog, bot_prefix: str) -> ui.Container:
         content: str = f"## {cog.__cog_name__} Commands\n"
@@ -271,6 +291,7 @@ class Utils(FurinaCog):
                 """,
                 ctx.guild.id,
             )
+            self.bot.prefixes.pop(ctx.guild.id, None)
         else:
             await self.pool.execute(
                 """
@@ -280,7 +301,8 @@ class Utils(FurinaCog):
                 ctx.guild.id,
                 prefix,
             )
-        await self.__update_custom_prefixes()
+            self.bot.prefixes[ctx.guild.id] = prefix
+        await self.bot.bus.publish(PREFIX_TOPIC, ctx.guild.id)
         prefix = self.bot.prefixes.get(ctx.guild.id) or settings.DEFAULT_PREFIX
         await ctx.reply(
             view=LayoutView(
@@ -480,6 +502,7 @@ class Utils(FurinaCog):
         await ctx.reply(view=LayoutView(container))
 
     @commands.hybrid_command(name="dictionary", aliases=["dict"])
+    @governed(4)
     @app_commands.allowed_installs(guilds=True, users=True)
     async def dict_command(self, ctx: FurinaCtx, word: str) -> None:
         """Lookup a word in the dictionary
@@ -497,6 +520,7 @@ class Utils(FurinaCog):
         view.message = await ctx.reply(view=view)
 
     @commands.command(name="urbandictionary", aliases=["urban"])
+    @governed(4)
     async def urban_command(self, ctx: FurinaCtx, *, query: str) -> None:
         """Lookup a word in the urban dictionary
 
@@ -551,7 +575,10 @@ class Utils(FurinaCog):
         )
         await ctx.reply(view=LayoutView(container))
 
-    @commands.command(name="stats", aliases=["stat"])
+    @commands.group(
+        name="stats", aliases=["stat"], invoke_without_command=True
+    )
+    @governed(2)
     async def stats_command(self, ctx: FurinaCtx) -> None:
         """Get the bot's stats
 
@@ -562,6 +589,8 @@ class Utils(FurinaCog):
         - Most recent 10 prefix commands.
         - Number of slash commands have been completed.
         - Most recent 10 slash commands.
+        - Most used prefix and slash commands.
+        - p50/p95/p99 run time of the slowest commands in this server.
         """
         assert self.bot.user is not None
         container = ui.Container(
@@ -575,8 +604,7 @@ class Utils(FurinaCog):
         )
         assert ctx.guild is not None
         guild_id = ctx.guild.id
-        if guild_id in self.bot.command_cache:
-            prefix_cmds: list[str] = self.bot.command_cache[guild_id]
+        prefix_cmds = self.bot.command_cache.get(guild_id)
         prefix_stats = ""
         if prefix_cmds:
             for cmd, group in groupby(prefix_cmds):
@@ -587,9 +615,7 @@ class Utils(FurinaCog):
                 prefix_stats += "\n"
         else:
             prefix_stats = "No prefix commands history from this server\n"
-        app_cmds = ""
-        if guild_id in self.bot.app_command_cache:
-            app_cmds: list[str] = self.bot.app_command_cache[guild_id]
+        app_cmds = self.bot.app_command_cache.get(guild_id)
         app_stats = ""
         if app_cmds:
             for cmd, group in groupby(app_cmds):
@@ -600,24 +626,100 @@ class Utils(FurinaCog):
                 app_stats += "\n"
         else:
             app_stats = "No app commands history from this server\n"
-        total_prefix = await self.pool.fetchval(
-            """SELECT COUNT(*) FROM prefix_commands"""
-        )
-        total_slash = await self.pool.fetchval(
-            """SELECT COUNT(*) FROM app_commands"""
-        )
+        usage = self.bot.usage
         container.add_item(
             ui.TextDisplay(
                 "### Most recent prefix commands\n"
                 + prefix_stats
-                + f"### Total prefix commands completed: {total_prefix}\n"
+                + "### Total prefix commands completed:"
+                + f" {usage.total('prefix')}"
+                + f" ({usage.total('prefix', guild_id)} here)\n"
                 + "### Most recent slash commands\n"
                 + app_stats
-                + f"### Total slash commands completed: {total_slash}\n"
+                + "### Total slash commands completed:"
+                + f" {usage.total('app')}"
+                + f" ({usage.total('app', guild_id)} here)\n"
+                + "### Most used commands\n"
+                + self.__most_used()
             )
         )
+        container.add_item(ui.Separator())
+        container.add_item(ui.TextDisplay(self.__latency_stats(guild_id)))
         await ctx.reply(view=LayoutView(container))
 
+    @stats_command.command(name="timeline", aliases=["activity"])
+    async def stats_timeline(
+        self, ctx: FurinaCtx, scope: Literal["server", "global"] = "server"
+    ) -> None:
+        """Show the commands activity as sparklines
+
+        Completed commands per minute over the last hour,
+        per hour over the last 2 days and per day over the last 30 days.
+
+        Parameters
+        ----------
+        scope : Literal["server", "global"], optional
+            Activity of this server or of every server, default is `server`
+        """
+        assert ctx.guild is not None
+        timeline = self.bot.activity.of(
+            ctx.guild.id if scope == "server" else None
+        )
+        title = ctx.guild.name if scope == "server" else "Global"
+        container = ui.Container(
+            ui.TextDisplay(f"## {title} Activity"), ui.Separator()
+        )
+        if timeline is None:
+            container.add_item(
+                ui.TextDisplay("No commands completed in this server yet")
+            )
+            await ctx.reply(view=LayoutView(container))
+            return
+        now = discord.utils.utcnow().timestamp()
+        labels = {
+            "minute": "Last hour, per minute",
+            "hour": "Last 2 days, per hour",
+            "day": "Last 30 days, per day",
+        }
+        for name, ring in timeline.rings.items():
+            counts = ring.series(now)
+            container.add_item(
+                ui.TextDisplay(
+                    f"### {labels[name]}\n"
+                    f"`{sparkline(counts)}`\n"
+                    f"-# Total {sum(counts)} · Peak {max(counts)}"
+                    f" · Now {counts[-1]}"
+                )
+            )
+        await ctx.reply(view=LayoutView(container))
+
+    def __most_used(self, limit: int = 5) -> str:
+        """The most used prefix and slash commands"""
+        lines = [
+            f"- `{command}` ({kind}) x{uses}"
+            for kind in ("prefix", "app")
+            for command, uses in self.bot.usage.most_used(kind, limit)
+        ]
+        return "\n".join(lines) + "\n" if lines else "No commands yet\n"
+
+    def __latency_stats(self, guild_id: int, limit: int = 5) -> str:
+        """p50/p95/p99 of the slowest commands used in a guild"""
+        latencies = [
+            (command, window.percentiles(50, 95, 99))
+            for command, window in self.bot.latencies.of_guild(
+                guild_id
+            ).items()
+        ]
+        if not latencies:
+            return "### Command latency\nNo commands timed in this server"
+        latencies.sort(key=lambda item: item[1][1], reverse=True)
+        lines = [
+            f"- `{command}` {p50 * 1000:.0f}"
+            f" / {p95 * 1000:.0f} / {p99 * 1000:.0f}ms"
+            for command, (p50, p95, p99) in latencies[:limit]
+        ]
+        return "### Command latency (p50 / p95 / p99)\n" + "\n".join(lines)
+
 
 async def setup(bot: FurinaBot) -> None:
     await bot.add_cog(Utils(bot))
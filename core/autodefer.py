@@ -0,0 +1,187 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from functools import partial
+from typing import TYPE_CHECKING, Any, TypeVar
+
+import discord
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from core.stats import CommandLatencies
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+def no_auto_defer(func: T) -> T:
+    """Never auto defer a command, like one responding with a modal
+
+    Works above or below the command decorator.
+    """
+    callback = getattr(func, "callback", func)
+    callback.__furina_auto_defer__ = False
+    return func
+
+
+def defer_ephemerally(func: T) -> T:
+    """Auto defer a command ephemerally, for one replying ephemerally
+
+    Works above or below the command decorator.
+    """
+    callback = getattr(func, "callback", func)
+    callback.__furina_defer_ephemeral__ = True
+    return func
+
+
+class AutoDefer:
+    """Defers hybrid commands that are about to miss the 3 seconds deadline
+
+    Only hybrid commands are deferred, their `FurinaCtx.defer` does nothing
+    once deferred, while plain app commands respond on their own.
+    A command is deferred right away when its recent run times say it is
+    likely to be slow, otherwise a timer defers it if it has not responded
+    after `after` seconds. Fast commands keep their single response.
+
+    Attributes
+    ----------
+    latencies : CommandLatencies
+        Run times of the commands, shared with the rest of the bot
+    after : float
+        Seconds before the timer defers
+    predict : float
+        Commands whose `percentile` run time is above this many seconds
+        are deferred right away
+    percentile : float
+        The run time percentile used to predict slow commands
+    min_samples : int
+        Runs needed before predicting
+    timed : int
+        Commands deferred by the timer
+    predicted : int
+        Commands deferred right away
+    """
+
+    def __init__(
+        self,
+        latencies: CommandLatencies,
+        *,
+        after: float = 2.0,
+        predict: float = 1.5,
+        percentile: float = 90,
+        min_samples: int = 10,
+    ) -> None:
+        self.latencies = latencies
+        self.after = after
+        self.predict = predict
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.timed: int = 0
+        self.predicted: int = 0
+        # timer defers in flight by interaction ID
+        self._deferring: dict[int, asyncio.Task[None]] = {}
+
+    @staticmethod
+    def enabled(command: Any) -> bool:
+        """Whether a command can be auto deferred
+
+        Only hybrid commands not marked with `no_auto_defer` are.
+        """
+        return getattr(
+            command, "__commands_is_hybrid_app_command__", False
+        ) and getattr(command.callback, "__furina_auto_defer__", True)
+
+    @staticmethod
+    def ephemeral(callback: Callable[..., Any]) -> bool:
+        """Whether a command is deferred ephemerally, see `defer_ephemerally`"""
+        return getattr(callback, "__furina_defer_ephemeral__", False)
+
+    def likely_slow(self, name: str) -> bool:
+        """Whether the command's recent runs say it will be slow"""
+        window = self.latencies.commands.get(name)
+        if window is None or window.count < self.min_samples:
+            return False
+        (latency,) = window.percentiles(self.percentile)
+        return latency > self.predict
+
+    def start_timer(
+        self,
+        interaction: discord.Interaction,
+        *,
+        ephemeral: bool = False,
+        waited: float = 0.0,
+    ) -> asyncio.TimerHandle:
+        """Defer the interaction after `after` seconds,
+        minus the seconds it `waited` already
+
+        Cancel the returned handle once the command is done.
+        """
+        return asyncio.get_running_loop().call_later(
+            max(self.after - waited, 0),
+            partial(self.__on_timer, interaction, ephemeral=ephemeral),
+        )
+
+    async def defer(
+        self, interaction: discord.Interaction, *, ephemeral: bool = False
+    ) -> None:
+        """|coro|
+
+        Defer the interaction right away, if it was not responded to
+        """
+        self.predicted += 1
+        await self.__defer(interaction, ephemeral=ephemeral)
+
+    async def settle(self, interaction: discord.Interaction) -> None:
+        """|coro|
+
+        Wait for the timer's defer of the interaction, if it is in flight
+
+        `response.is_done` is only true once the defer is acknowledged,
+        responding meanwhile would acknowledge the interaction twice.
+        """
+        task = self._deferring.get(interaction.id)
+        if task is not None:
+            await asyncio.shield(task)
+
+    def __on_timer(
+        self, interaction: discord.Interaction, *, ephemeral: bool
+    ) -> None:
+        if interaction.response.is_done():
+            return
+        self.timed += 1
+        task = asyncio.create_task(
+            self.__defer(interaction, ephemeral=ephemeral)
+        )
+        self._deferring[interaction.id] = task
+        task.add_done_callback(
+            lambda _: self._deferring.pop(interaction.id, None)
+        )
+
+    @staticmethod
+    async def __defer(
+        interaction: discord.Interaction, *, ephemeral: bool
+    ) -> None:
+        if interaction.response.is_done():
+            return
+        try:
+            await interaction.response.defer(ephemeral=ephemeral)
+        except (discord.InteractionResponded, discord.HTTPException) as e:
+            # the command responded at the same time
+            logger.debug("Could not auto defer: %s", e)
@@ -0,0 +1,169 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import TYPE_CHECKING
+from uuid import uuid4
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine
+
+    from core.scheduler import Scheduler
+    from core.sql import SQL
+
+    Subscriber = Callable[[str], Coroutine[None, None, None]]
+
+logger = logging.getLogger(__name__)
+
+# Topics
+PREFIX_TOPIC = "prefix"
+TAG_TOPIC = "tag"
+
+
+class InvalidationBus:
+    """Cache invalidation across processes sharing the same database
+
+    Published changes are appended to the `cache_invalidations` table,
+    every process polls the rows it has not seen yet and passes their keys
+    to the subscribers of the topic, so they can patch only what changed.
+    Changes published by this process are not delivered back to it.
+
+    Attributes
+    ----------
+    pool : SQL
+        The database holding the change log
+    scheduler : Scheduler
+        The scheduler running the polls
+    interval : float
+        Seconds between polls
+    retention : int
+        Seconds to keep the published changes for
+    origin : str
+        Unique id of this process
+    """
+
+    def __init__(
+        self,
+        pool: SQL,
+        scheduler: Scheduler,
+        *,
+        interval: float = 2.0,
+        retention: int = 3600,
+    ) -> None:
+        self.pool = pool
+        self.scheduler = scheduler
+        self.interval = interval
+        self.retention = retention
+        self.origin = f"{os.getpid()}-{uuid4().hex[:8]}"
+        self._last_id: int = 0
+        self._subscribers: defaultdict[str, list[Subscriber]] = defaultdict(
+            list
+        )
+
+    async def start(self) -> None:
+        """|coro|
+
+        Start polling, changes published before this are skipped
+        """
+        self._last_id = await self.pool.fetchval(
+            """SELECT COALESCE(MAX(id), 0) FROM cache_invalidations"""
+        )
+        self.scheduler.every(
+            "cache-invalidation-poll", self.interval, self.poll
+        )
+        self.scheduler.every(
+            "cache-invalidation-prune", self.retention, self.prune
+        )
+
+    def subscribe(self, topic: str, callback: Subscriber) -> None:
+        """Call `callback` with the key of every change on `topic`
+
+        Parameters
+        ----------
+        topic : str
+            The topic to subscribe to
+        callback : Callable[[str], Coroutine]
+            The coroutine function to call with the changed key
+        """
+        self._subscribers[topic].append(callback)
+
+    def unsubscribe(self, topic: str, callback: Subscriber) -> None:
+        """Remove a callback added with `subscribe`"""
+        try:
+            self._subscribers[topic].remove(callback)
+        except ValueError:
+            pass
+
+    async def publish(self, topic: str, key: str | int) -> None:
+        """|coro|
+
+        Tell the other processes that `key` of `topic` has changed
+
+        Parameters
+        ----------
+        topic : str
+            The topic of the change, like `PREFIX_TOPIC`
+        key : str | int
+            What has changed, like a guild ID
+        """
+        await self.pool.execute(
+            """
+            INSERT INTO cache_invalidations (topic, key, origin, created_at)
+            VALUES (?, ?, ?, ?)
+            """,
+            topic,
+            str(key),
+            self.origin,
+            int(time.time()),
+        )
+
+    async def poll(self) -> None:
+        """|coro|
+
+        Deliver the changes published by other processes since last poll
+        """
+        rows = await self.pool.fetchall(
+            """
+            SELECT id, topic, key, origin FROM cache_invalidations
+            WHERE id > ?
+            ORDER BY id
+            """,
+            self._last_id,
+        )
+        for row in rows:
+            self._last_id = row["id"]
+            if row["origin"] == self.origin:
+                continue
+            for callback in self._subscribers.get(row["topic"], []):
+                try:
+                    await callback(row["key"])
+                except Exception:
+                    logger.exception(
+                        "Invalidation subscriber of %s failed", row["topic"]
+                    )
+
+    async def prune(self) -> None:
+        """|coro|
+
+        Delete changes older than `retention`
+        """
+        await self.pool.execute(
+            """DELETE FROM cache_invalidations WHERE created_at < ?""",
+            int(time.time()) - self.retention,
+        )
@@ -0,0 +1,212 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+from functools import partial
+from typing import TYPE_CHECKING
+
+from discord import ui
+
+from core.rest import Priority
+from core.views import LayoutView
+
+if TYPE_CHECKING:
+    from discord import Message
+
+    from core import FurinaBot
+
+logger = logging.getLogger(__name__)
+
+
+class SenderDMs:
+    """The DMs of a single sender during a digest window
+
+    Attributes
+    ----------
+    sender : str
+        Short hash of the sender ID, DMs are forwarded anonymously
+    contents : list[str]
+        Distinct contents kept, at most `DMDigest.per_sender`
+    count : int
+        DMs received, duplicates included
+    attachments : int
+        Attachments received
+    first_seen : float
+        Unix time of the first DM
+    last_seen : float
+        Unix time of the latest DM
+    """
+
+    __slots__ = (
+        "attachments",
+        "contents",
+        "count",
+        "first_seen",
+        "last_seen",
+        "sender",
+    )
+
+    def __init__(self, sender: str) -> None:
+        self.sender = sender
+        self.contents: list[str] = []
+        self.count: int = 0
+        self.attachments: int = 0
+        self.first_seen = self.last_seen = time.time()
+
+
+class DMDigest:
+    """Forwards the bot's DMs to the owner as periodic digests
+
+    DMs are grouped by sender, keeping at most `per_sender` distinct
+    contents each, and at most `max_senders` senders are detailed per
+    digest, within `MAX_CHARACTERS`. Everything past that is only counted,
+    so a digest is a single message however many DMs arrive.
+
+    Attributes
+    ----------
+    bot : FurinaBot
+        The bot forwarding the DMs
+    interval : float
+        Seconds between digests
+    max_senders : int
+        Senders detailed in a single digest
+    per_sender : int
+        Distinct contents kept per sender
+    overflow : int
+        DMs only counted in the current window
+    """
+
+    # Discord caps the text of all the components of a message
+    MAX_CHARACTERS = 4000
+    # kept for the "and more" line
+    OVERFLOW_RESERVE = 100
+
+    def __init__(
+        self,
+        bot: FurinaBot,
+        *,
+        interval: float = 60,
+        max_senders: int = 8,
+        per_sender: int = 3,
+    ) -> None:
+        self.bot = bot
+        self.interval = interval
+        self.max_senders = max_senders
+        self.per_sender = per_sender
+        self.overflow: int = 0
+        self._senders: dict[int, SenderDMs] = {}
+        self._overflow_senders: set[int] = set()
+
+    @property
+    def pending(self) -> int:
+        """DMs waiting for the next digest"""
+        return sum(dms.count for dms in self._senders.values()) + self.overflow
+
+    def start(self) -> None:
+        """Start sending digests"""
+        self.bot.scheduler.every("dm-digest", self.interval, self.digest)
+
+    def stop(self) -> None:
+        """Stop sending digests"""
+        self.bot.scheduler.cancel("dm-digest")
+
+    def add(self, message: Message) -> None:
+        """Queue a DM for the next digest"""
+        author_id = message.author.id
+        dms = self._senders.get(author_id)
+        if dms is None:
+            if len(self._senders) >= self.max_senders:
+                self.overflow += 1
+                self._overflow_senders.add(author_id)
+                return
+            sender = hashlib.blake2b(
+                str(author_id).encode(), digest_size=3
+            ).hexdigest()
+            dms = self._senders[author_id] = SenderDMs(sender)
+        dms.count += 1
+        dms.attachments += len(message.attachments)
+        dms.last_seen = time.time()
+        content = message.content[:100]
+        if (
+            content
+            and content not in dms.contents
+            and len(dms.contents) < self.per_sender
+        ):
+            dms.contents.append(content)
+
+    async def digest(self, *, background: bool = True) -> None:
+        """|coro|
+
+        Send the DMs received since the previous digest
+
+        Parameters
+        ----------
+        background : bool, optional
+            Whether to send it through `FurinaBot.rest`, default is `True`.
+            Set to `False` while shutting down, when it no longer runs.
+        """
+        if not self._senders:
+            return
+        senders = self._senders
+        overflow = self.overflow
+        overflow_senders = len(self._overflow_senders)
+        self._senders = {}
+        self.overflow = 0
+        self._overflow_senders = set()
+
+        title = "## DM Digest"
+        container = ui.Container(ui.TextDisplay(title))
+        budget = self.MAX_CHARACTERS - self.OVERFLOW_RESERVE - len(title)
+        for dms in senders.values():
+            text = (
+                f"### Sender `{dms.sender}` x{dms.count}\n"
+                f"First <t:{int(dms.first_seen)}:R>"
+                f" · Last <t:{int(dms.last_seen)}:R>"
+            )
+            if dms.attachments:
+                text += f" · {dms.attachments} attachments"
+            if len(text) > budget:
+                # no room left, only counted
+                overflow += dms.count
+                overflow_senders += 1
+                continue
+            for content in dms.contents:
+                quote = "\n> " + content.replace("\n", "\n> ")
+                if len(text) + len(quote) > budget:
+                    break
+                text += quote
+            budget -= len(text)
+            container.add_item(ui.Separator())
+            container.add_item(ui.TextDisplay(text))
+        if overflow:
+            container.add_item(ui.Separator())
+            container.add_item(
+                ui.TextDisplay(
+                    f"-# And {overflow} more DMs"
+                    f" from {overflow_senders} senders"
+                )
+            )
+        owner = self.bot.get_user(self.bot.owner_id)
+        if owner is None:
+            logger.warning("Owner not found, dropped a DM digest")
+            return
+        send = partial(owner.send, view=LayoutView(container))
+        if background:
+            await self.bot.rest.call(send, priority=Priority.LOW)
+        else:
+            await send()
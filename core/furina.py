@@ -15,27 +15,41 @@ limitations under the License.
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
 import typing
 from collections import defaultdict
+from contextlib import asynccontextmanager
 from pathlib import Path
 from platform import python_version
+from time import perf_counter
 
 import asqlite
 import discord
 from discord import app_commands, ui, utils
 from discord.ext import commands
 from discord.ext.commands import errors, when_mentioned_or
+from discord.ext.commands.view import StringView
 
 from cogs import EXTENSIONS
-from core import settings
+from core import metrics, settings
+from core.autodefer import AutoDefer
+from core.bus import InvalidationBus
+from core.governor import Governor, Overloaded
+from core.history import CommandUsage, RecentCommands
+from core.reporter import ErrorReporter
+from core.rest import RateLimitTracker, RestScheduler
+from core.scheduler import Scheduler
 from core.sql import SQL
+from core.stats import Activity, CommandLatencies, LatencyWindow, redact
 from core.views import LayoutView
 
 if typing.TYPE_CHECKING:
+    from collections.abc import AsyncGenerator, Callable, Coroutine
     from datetime import datetime
 
     import aiohttp
+    from aiohttp import web
 
 logger = logging.getLogger(__name__)
 
@@ -48,23 +62,155 @@ class FurinaCtx(commands.Context):
     async def tick(self) -> None:
         """React checkmark to the command message"""
         try:
-            await self.message.add_reaction(settings.CHECKMARK)
+            with self.bot.rest.interactive():
+                await self.message.add_reaction(settings.CHECKMARK)
         except discord.HTTPException:
             pass
 
     async def cross(self) -> None:
         """React a cross to the command message"""
         try:
-            await self.message.add_reaction(settings.CROSS)
+            with self.bot.rest.interactive():
+                await self.message.add_reaction(settings.CROSS)
         except discord.HTTPException:
             pass
 
+    async def defer(self, *, ephemeral: bool = False) -> None:
+        """Defer the interaction, if it was not already auto deferred"""
+        await self.__settle()
+        if self.interaction and self.interaction.response.is_done():
+            return
+        await super().defer(ephemeral=ephemeral)
+
+    async def send(
+        self, *args: typing.Any, **kwargs: typing.Any
+    ) -> discord.Message:
+        """Send a message, once the interaction's auto defer is done"""
+        await self.__settle()
+        return await super().send(*args, **kwargs)
+
+    async def __settle(self) -> None:
+        if self.interaction is not None:
+            tree = typing.cast("FurinaTree", self.bot.tree)
+            await tree.auto_defer.settle(self.interaction)
+
     @property
     def cs(self) -> aiohttp.ClientSession:
         """Shortcut for `FurinaBot.cs`"""
         return self.bot.cs
 
 
+class FurinaTree(app_commands.CommandTree["FurinaBot"]):
+    """Custom `CommandTree` that governs, defers and records app commands"""
+
+    # interactions not acknowledged within 3 seconds are dropped by Discord,
+    # this leaves time to reply when shed
+    GOVERNOR_DEADLINE = 2.5
+
+    def __init__(self, client: FurinaBot, **kwargs: typing.Any) -> None:
+        super().__init__(client, **kwargs)
+        self.auto_defer = AutoDefer(client.latencies)
+
+    async def __auto_defer(
+        self,
+        interaction: discord.Interaction[FurinaBot],
+        name: str,
+        waited: float,
+    ) -> asyncio.TimerHandle | None:
+        """Defer the command now if it is likely slow, else start a timer
+
+        The timer is shortened by the seconds `waited` for a slot.
+        """
+        command = interaction.command
+        if not AutoDefer.enabled(command):
+            return None
+        assert command is not None
+        ephemeral = AutoDefer.ephemeral(command.callback)
+        if self.auto_defer.likely_slow(name):
+            await self.auto_defer.defer(interaction, ephemeral=ephemeral)
+            return None
+        return self.auto_defer.start_timer(
+            interaction, ephemeral=ephemeral, waited=waited
+        )
+
+    async def _call(self, interaction: discord.Interaction[FurinaBot]) -> None:
+        if interaction.type is not discord.InteractionType.application_command:
+            await super()._call(interaction)
+            return
+        bot = interaction.client
+        command = interaction.command
+        name = command.qualified_name if command else "unknown"
+        callback = getattr(command, "callback", None)
+        timer = None
+        status = "error"
+        start = perf_counter()
+        try:
+            with bot.rest.interactive():
+                async with bot.governed(
+                    callback, deadline=self.GOVERNOR_DEADLINE
+                ):
+                    # never defer a command still waiting for its slot
+                    timer = await self.__auto_defer(
+                        interaction, name, perf_counter() - start
+                    )
+                    await super()._call(interaction)
+            status = "error" if interaction.command_failed else "ok"
+        except Overloaded:
+            status = "shed"
+            try:
+                if interaction.response.is_done():
+                    await interaction.followup.send(
+                        FurinaBot.OVERLOADED_MESSAGE, ephemeral=True
+                    )
+                else:
+                    await interaction.response.send_message(
+                        FurinaBot.OVERLOADED_MESSAGE, ephemeral=True
+                    )
+            except discord.HTTPException:
+                pass
+        finally:
+            if timer is not None:
+                timer.cancel()
+            elapsed = perf_counter() - start
+            if status != "shed":
+                bot.latencies.record(
+                    name,
+                    interaction.guild_id,
+                    elapsed,
+                    failed=status == "error",
+                    arguments=lambda: redact(interaction.namespace),
+                )
+            metrics.COMMANDS.inc(name, "app", status)
+            metrics.COMMAND_DURATION.observe(name, "app", value=elapsed)
+
+    async def on_error(
+        self,
+        interaction: discord.Interaction[FurinaBot],
+        error: app_commands.AppCommandError,
+        /,
+    ) -> None:
+        if isinstance(error, app_commands.CheckFailure):
+            message = f"{settings.CROSS} **{error}**"
+        else:
+            command = interaction.command
+            group = interaction.client.errors.report(
+                error, command=command.qualified_name if command else None
+            )
+            message = (
+                f"{settings.CROSS} **Something went wrong**\n"
+                f"-# Reported as `{group.fingerprint}`"
+            )
+        try:
+            if interaction.response.is_done():
+                await interaction.followup.send(message, ephemeral=True)
+            else:
+                await interaction.response.send_message(
+                    message, ephemeral=True
+                )
+        except discord.HTTPException:
+            pass
+
+
 class FurinaBot(commands.Bot):
     r"""Customized `commands.Bot` class
 
@@ -82,10 +228,20 @@ class FurinaBot(commands.Bot):
     """
 
     DEFAULT_PREFIX: str = settings.DEFAULT_PREFIX
+    RECENT_COMMANDS_PATH: Path = Path() / "db" / "recent_commands.json"
+    OVERLOADED_MESSAGE: str = (
+        f"{settings.CROSS} I'm a little overwhelmed right now,"
+        " please try again in a moment!"
+    )
 
     def __init__(self, *, client_session: aiohttp.ClientSession) -> None:
+        self.ratelimits = RateLimitTracker()
+        # run time of every command, also read by `FurinaTree.auto_defer`
+        self.latencies = CommandLatencies()
         super().__init__(
             command_prefix=self.get_pre,
+            tree_cls=FurinaTree,
+            http_trace=self.ratelimits.trace_config,
             case_insensitive=True,
             strip_after_prefix=True,
             intents=discord.Intents(
@@ -104,12 +260,31 @@ class FurinaBot(commands.Bot):
         )
         self.owner_id = settings.OWNER_ID
         self.cs = client_session
+        self.scheduler = Scheduler()
+        self.rest = RestScheduler()
+        self.governor = Governor()
+        self.errors = ErrorReporter(self)
+        self.metrics_runner: web.AppRunner | None = None
         # custom prefixes, in `{guild_id: prefix}` format
         self.prefixes: dict[int, str] = {}
 
-        # cache the latest 10 commands for some statistics
-        self.command_cache = defaultdict(list)
-        self.app_command_cache = defaultdict(list)
+        # the latest 10 commands of every guild for some statistics
+        self.command_cache = RecentCommands()
+        self.app_command_cache = RecentCommands()
+        # completed commands counters, updated by the history writer
+        self.usage = CommandUsage()
+        # completed commands per minute, hour and day
+        self.activity = Activity()
+
+        # live cog states handed off between unload and load on reload,
+        # in `{cog_name: state}` format
+        self.cog_states: dict[str, dict[str, typing.Any]] = {}
+        self._reloading: bool = False
+
+        # listeners run time, in `{(event_name, listener): stats}` format
+        self.listener_stats: defaultdict[tuple[str, str], LatencyWindow] = (
+            defaultdict(LatencyWindow)
+        )
 
     @property
     def uptime(self) -> str:
@@ -149,6 +324,134 @@ class FurinaBot(commands.Bot):
         prefix = self.prefixes.get(message.guild.id) or self.DEFAULT_PREFIX
         return when_mentioned_or(prefix)(self, message)
 
+    def dispatch(
+        self, event_name: str, /, *args: typing.Any, **kwargs: typing.Any
+    ) -> None:
+        metrics.GATEWAY_EVENTS.inc(event_name)
+        super().dispatch(event_name, *args, **kwargs)
+
+    async def invoke(
+        self, ctx: commands.Context[FurinaBot], /
+    ) -> None:
+        if ctx.command is None:
+            await super().invoke(ctx)
+            return
+        # recorded and governed as the subcommand, not its root group
+        command = self.__invoked_command(ctx)
+        name = command.qualified_name
+        status = "error"
+        start = perf_counter()
+        try:
+            with self.rest.interactive():
+                async with self.governed(command.callback):
+                    await super().invoke(ctx)
+            status = "error" if ctx.command_failed else "ok"
+        except Overloaded:
+            status = "shed"
+            await ctx.reply(self.OVERLOADED_MESSAGE)
+        finally:
+            elapsed = perf_counter() - start
+            if status != "shed":
+                self.latencies.record(
+                    name,
+                    ctx.guild.id if ctx.guild else None,
+                    elapsed,
+                    failed=status == "error",
+                    arguments=lambda: redact(
+                        (
+                            *zip(
+                                command.clean_params,
+                                ctx.args[2 if command.cog else 1 :],
+                                strict=False,
+                            ),
+                            *ctx.kwargs.items(),
+                        )
+                    ),
+                )
+            metrics.COMMANDS.inc(name, "prefix", status)
+            metrics.COMMAND_DURATION.observe(name, "prefix", value=elapsed)
+
+    @staticmethod
+    def __invoked_command(ctx: commands.Context[FurinaBot]) -> commands.Command:
+        """The subcommand `ctx` is about to run, or its command
+
+        `ctx.command` is the root command until the groups are invoked,
+        so the subcommand names are peeked the way `commands.Group` reads
+        them, without consuming the message.
+        """
+        assert ctx.command is not None
+        command = ctx.command
+        view = StringView(ctx.view.buffer)
+        view.index = ctx.view.index
+        while isinstance(command, commands.Group):
+            view.skip_ws()
+            subcommand = command.all_commands.get(view.get_word())
+            if subcommand is None:
+                break
+            command = subcommand
+        return command
+
+    @asynccontextmanager
+    async def governed(
+        self,
+        callback: Callable[..., typing.Any] | None,
+        *,
+        deadline: float | None = None,
+    ) -> AsyncGenerator[None, None]:
+        """Run a command within the limits of `governor`
+
+        Commands not marked with `core.governor.governed` run right away.
+
+        Parameters
+        ----------
+        callback : Callable, optional
+            Callback of the command
+        deadline : float, optional
+            Max seconds to wait for a slot, default is `Governor.deadline`
+
+        Raises
+        ------
+        Overloaded
+            The command is overloaded and the invocation was shed
+        """
+        limit = self.governor.limit_of(callback)
+        if callback is None or limit is None:
+            yield
+            return
+        async with self.governor.slot(
+            callback.__qualname__, limit, deadline=deadline
+        ):
+            yield
+
+    async def _run_event(
+        self,
+        coro: Callable[..., Coroutine[typing.Any, typing.Any, typing.Any]],
+        event_name: str,
+        *args: typing.Any,
+        **kwargs: typing.Any,
+    ) -> None:
+        """Run an event listener and record how long it took
+
+        Every listener scheduled by `dispatch`, including the cog ones,
+        runs through here, so this is where all of them get timed.
+        """
+        failed = False
+        start = perf_counter()
+        try:
+            await coro(*args, **kwargs)
+        except asyncio.CancelledError:
+            pass
+        except Exception:  # ruff: ignore[blind-except]
+            failed = True
+            try:
+                await self.on_error(event_name, *args, **kwargs)
+            except asyncio.CancelledError:
+                pass
+        finally:
+            self.listener_stats[event_name, coro.__qualname__].add(
+                perf_counter() - start, failed=failed
+            )
+
     async def on_ready(self) -> None:
         assert self.user is not None
         logger.info("Logged in as %s", self.user.name)
@@ -166,8 +469,7 @@ class FurinaBot(commands.Bot):
             silent=True,
             wait=True,
         )
-        await asyncio.sleep(10)
-        await message.delete()
+        self.scheduler.once("delete-ready-message", 10, message.delete)
 
     async def setup_hook(self) -> None:
         logger.info("discord.py v%s", discord.__version__)
@@ -179,8 +481,55 @@ class FurinaBot(commands.Bot):
         db_path.mkdir(exist_ok=True)
         self.pool = SQL(await asqlite.create_pool(str(db_path / "furina.db")))
         await self.pool.create_tables()
+        await self.usage.load(self.pool)
+        await self.__load_recent_commands()
+        self.bus = InvalidationBus(
+            self.pool,
+            self.scheduler,
+            interval=settings.INVALIDATION_POLL_INTERVAL,
+        )
+        await self.bus.start()
+        self.rest.start()
+        self.errors.start()
+        if settings.METRICS_PORT:
+            self.metrics_runner = await metrics.start_server(
+                settings.METRICS_HOST, settings.METRICS_PORT
+            )
         await self.__load_extensions()
 
+    async def __load_recent_commands(self) -> None:
+        """Restore the recent commands and activity saved on shutdown"""
+        try:
+            data = json.loads(
+                await asyncio.to_thread(
+                    self.RECENT_COMMANDS_PATH.read_text, "utf-8"
+                )
+            )
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            logger.exception("Failed to restore the recent commands")
+            return
+        self.command_cache.load(data.get("prefix", {}))
+        self.app_command_cache.load(data.get("app", {}))
+        self.activity.load(data.get("activity", {}))
+
+    async def __save_recent_commands(self) -> None:
+        """Save the recent commands and activity, restored on the next boot"""
+        data = json.dumps(
+            {
+                "prefix": self.command_cache.dump(),
+                "app": self.app_command_cache.dump(),
+                "activity": self.activity.dump(),
+            }
+        )
+        try:
+            await asyncio.to_thread(
+                self.RECENT_COMMANDS_PATH.write_text, data, "utf-8"
+            )
+        except OSError:
+            logger.exception("Failed to save the recent commands")
+
     async def __load_extensions(self) -> None:
         """Load bot extensions"""
         logger.info("Loading extensions...")
@@ -198,14 +547,68 @@ class FurinaBot(commands.Bot):
                     "An error occured when trying to load %s", extension_name
                 )
 
+    async def reload_extension(
+        self, name: str, *, package: str | None = None
+    ) -> None:
+        """Reload an extension while handing off its cogs' live state
+
+        Every `MetaCog` removed during the reload exports its state
+        with `MetaCog.cog_export_state`, the reloaded cog with the same name
+        gets it back through `MetaCog.cog_import_state` before `cog_load`.
+        """
+        self._reloading = True
+        try:
+            await super().reload_extension(name, package=package)
+        finally:
+            self._reloading = False
+            self.cog_states.clear()
+
+    async def add_cog(
+        self,
+        cog: commands.Cog,
+        /,
+        *,
+        override: bool = False,
+        guild: discord.abc.Snowflake | None = utils.MISSING,
+        guilds: list[discord.abc.Snowflake] = utils.MISSING,
+    ) -> None:
+        state = self.cog_states.pop(cog.qualified_name, None)
+        if state is not None and isinstance(cog, MetaCog):
+            cog.cog_import_state(state)
+            logger.info("Imported live state of cog %s", cog.qualified_name)
+        await super().add_cog(
+            cog, override=override, guild=guild, guilds=guilds
+        )
+
+    async def remove_cog(
+        self,
+        name: str,
+        /,
+        *,
+        guild: discord.abc.Snowflake | None = utils.MISSING,
+        guilds: list[discord.abc.Snowflake] = utils.MISSING,
+    ) -> commands.Cog | None:
+        cog = self.get_cog(name)
+        if self._reloading and isinstance(cog, MetaCog):
+            state = cog.cog_export_state()
+            if state is not None:
+                self.cog_states[name] = state
+        return await super().remove_cog(name, guild=guild, guilds=guilds)
+
     async def start(
         self, token: str = settings.TOKEN, *, reconnect: bool = True
     ) -> None:
         await super().start(token)
 
     async def close(self) -> None:
-        await self.pool.pool.close()
+        await self.scheduler.close()
+        await self.rest.close()
+        # cogs may still flush to the database while being unloaded
         await super().close()
+        await self.__save_recent_commands()
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
+        await self.pool.pool.close()
 
 
 class MetaCog:
@@ -217,6 +620,36 @@ class MetaCog:
         self.cs: aiohttp.ClientSession = bot.cs
         self.pool: SQL = bot.pool
 
+    @property
+    def handing_off(self) -> bool:
+        """Whether this cog's state is being handed off to a reloaded one
+
+        Cogs should not close resources they exported in `cog_unload`
+        while this is `True`.
+        """
+        return self.__cog_name__ in self.bot.cog_states
+
+    def cog_export_state(self) -> dict[str, typing.Any] | None:
+        """Snapshot the live state to survive an extension reload
+
+        Returns
+        -------
+        dict[str, Any], optional
+            The state to pass to the reloaded cog, `None` if nothing to keep
+        """
+        return None
+
+    def cog_import_state(self, state: dict[str, typing.Any]) -> None:
+        """Restore the state exported by the previous instance of this cog
+
+        Called before `cog_load`.
+
+        Parameters
+        ----------
+        state : dict[str, Any]
+            The state returned by `cog_export_state`
+        """
+
     async def cog_load(self) -> None:
         logger.info("Cog %s has been loaded", self.__cog_name__)
 
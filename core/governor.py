@@ -0,0 +1,198 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncGenerator, Callable
+
+T = TypeVar("T")
+
+
+class Overloaded(Exception):
+    """Raised when a governed command is shed
+
+    Attributes
+    ----------
+    name : str
+        Name of the shed command
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        super().__init__(f"{name} is overloaded")
+
+
+def governed(limit: int) -> Callable[[T], T]:
+    """Mark a command as expensive, limiting how many can run at once
+
+    Works on prefix, hybrid and app commands, above or below
+    the command decorator. On a group, only the group itself is governed,
+    not its subcommands.
+
+    Parameters
+    ----------
+    limit : int
+        How many invocations of the command can run at once
+    """
+
+    def decorator(func: T) -> T:
+        callback = getattr(func, "callback", func)
+        callback.__furina_concurrency__ = limit
+        return func
+
+    return decorator
+
+
+class CommandLimiter:
+    """In-flight limit of a governed command
+
+    Attributes
+    ----------
+    limit : int
+        How many invocations can run at once
+    waiting : int
+        Invocations waiting for a slot
+    running : int
+        Invocations currently running
+    average : float
+        Moving average of the run time in seconds
+    shed : int
+        Invocations rejected because the command was overloaded
+    """
+
+    __slots__ = (
+        "average",
+        "limit",
+        "running",
+        "semaphore",
+        "shed",
+        "waiting",
+    )
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.waiting: int = 0
+        self.running: int = 0
+        self.average: float = 0.0
+        self.shed: int = 0
+
+
+class Governor:
+    """Limits how many expensive commands run at once
+
+    Commands marked with `governed` wait for a slot of their own limit
+    and of the global one, everything else runs right away so cheap
+    commands keep responding during spikes.
+    An invocation is shed with `Overloaded` when the queue of its command
+    is full, when it would likely wait longer than `deadline`,
+    or when it actually did.
+
+    Attributes
+    ----------
+    global_limit : int
+        How many governed commands can run at once
+    max_queue : int
+        How many invocations of a command can wait for a slot
+    deadline : float
+        Max seconds an invocation waits for a slot
+    limiters : dict[str, CommandLimiter]
+        Limiters by command callback
+    """
+
+    def __init__(
+        self,
+        *,
+        global_limit: int = 16,
+        max_queue: int = 32,
+        deadline: float = 5.0,
+    ) -> None:
+        self.global_limit = global_limit
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.limiters: dict[str, CommandLimiter] = {}
+        self._global = asyncio.Semaphore(global_limit)
+
+    @staticmethod
+    def limit_of(callback: Any) -> int | None:
+        """The limit set by `governed`, `None` for cheap commands"""
+        return getattr(callback, "__furina_concurrency__", None)
+
+    @asynccontextmanager
+    async def slot(
+        self, name: str, limit: int, *, deadline: float | None = None
+    ) -> AsyncGenerator[None, None]:
+        """Wait for a slot to run a governed command
+
+        Parameters
+        ----------
+        name : str
+            Unique name of the command
+        limit : int
+            How many invocations of the command can run at once
+        deadline : float, optional
+            Max seconds to wait for the slot, default is `deadline`
+
+        Raises
+        ------
+        Overloaded
+            The invocation was shed
+        """
+        if deadline is None:
+            deadline = self.deadline
+        limiter = self.limiters.get(name)
+        if limiter is None:
+            limiter = self.limiters[name] = CommandLimiter(limit)
+        # expected wait if every queued invocation takes the average time
+        expected = limiter.waiting / limit * limiter.average
+        if limiter.waiting >= self.max_queue or expected > deadline:
+            limiter.shed += 1
+            raise Overloaded(name)
+
+        limiter.waiting += 1
+        try:
+            await self.__acquire(limiter, deadline)
+        except asyncio.TimeoutError:
+            limiter.shed += 1
+            raise Overloaded(name) from None
+        finally:
+            limiter.waiting -= 1
+
+        limiter.running += 1
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            limiter.running -= 1
+            self._global.release()
+            limiter.semaphore.release()
+            limiter.average += (perf_counter() - start - limiter.average) / 8
+
+    async def __acquire(self, limiter: CommandLimiter, timeout: float) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        await asyncio.wait_for(limiter.semaphore.acquire(), timeout)
+        try:
+            await asyncio.wait_for(
+                self._global.acquire(), max(deadline - loop.time(), 0)
+            )
+        except BaseException:
+            limiter.semaphore.release()
+            raise
@@ -0,0 +1,397 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict, defaultdict, deque
+from operator import itemgetter
+from typing import TYPE_CHECKING
+
+from core import metrics
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from core.sql import SQL
+
+    HistoryRow = tuple[int, int, str, int]
+    UsageKey = tuple[str, int, str]
+
+logger = logging.getLogger(__name__)
+
+
+class KnownUsers:
+    """User IDs already in the `users` table
+
+    Loaded on first use, then kept as a sorted `array('Q')`
+    (8 bytes per user) searched with bisect. Users added since are kept
+    in a small set, merged into the array once it grows.
+
+    Attributes
+    ----------
+    pool : SQL
+        The database holding the `users` table
+    merge_every : int
+        How many added users to keep in the set before merging
+    loaded : bool
+        Whether the users have been loaded
+    """
+
+    def __init__(self, pool: SQL, *, merge_every: int = 1024) -> None:
+        self.pool = pool
+        self.merge_every = merge_every
+        self.loaded: bool = False
+        self._ids: array[int] = array("Q")
+        self._recent: set[int] = set()
+
+    def __contains__(self, user_id: int) -> bool:
+        if user_id in self._recent:
+            return True
+        index = bisect_left(self._ids, user_id)
+        return index < len(self._ids) and self._ids[index] == user_id
+
+    def __len__(self) -> int:
+        return len(self._ids) + len(self._recent)
+
+    async def load(self) -> None:
+        """|coro|
+
+        Load the user IDs from the database
+        """
+        rows = await self.pool.fetchall("SELECT id FROM users ORDER BY id")
+        self._ids = array("Q", (row[0] for row in rows))
+        self._recent = set()
+        self.loaded = True
+        logger.info("Loaded %d known users", len(self))
+
+    def add(self, user_id: int) -> None:
+        """Mark a user as written to the database"""
+        if user_id in self:
+            return
+        self._recent.add(user_id)
+        if len(self._recent) >= self.merge_every:
+            self.__merge()
+
+    async def new_users(self, user_ids: Iterable[int]) -> list[int]:
+        """|coro|
+
+        Filter out the known users, loading them first if needed
+        """
+        if not self.loaded:
+            await self.load()
+        return [user_id for user_id in user_ids if user_id not in self]
+
+    def __merge(self) -> None:
+        # added users are never in the array already
+        self._ids = array("Q", sorted((*self._ids, *self._recent)))
+        self._recent = set()
+
+
+class CommandUsage:
+    """Completed commands counters, kept in the `command_usage` table
+
+    The table holds the uses of every command in every guild. It is
+    updated by `HistoryWriter` along with the history, and summed up here
+    in memory so the totals never need to scan the history tables.
+
+    Attributes
+    ----------
+    totals : defaultdict[str, int]
+        Uses by kind, `prefix` or `app`
+    guilds : defaultdict[tuple[str, int], int]
+        Uses by kind and guild
+    commands : defaultdict[tuple[str, str], int]
+        Uses by kind and command qualified name
+    """
+
+    BACKFILL_SQL = """
+        INSERT INTO command_usage (kind, guild_id, command, uses)
+        SELECT 'prefix', guild_id, command, COUNT(*) FROM prefix_commands
+        GROUP BY guild_id, command
+        UNION ALL
+        SELECT 'app', guild_id, command, COUNT(*) FROM app_commands
+        GROUP BY guild_id, command
+    """
+
+    def __init__(self) -> None:
+        self.totals: defaultdict[str, int] = defaultdict(int)
+        self.guilds: defaultdict[tuple[str, int], int] = defaultdict(int)
+        self.commands: defaultdict[tuple[str, str], int] = defaultdict(int)
+
+    async def load(self, pool: SQL) -> None:
+        """|coro|
+
+        Load the counters, counting the existing history
+        the first time the table is used
+        """
+        rows = await pool.fetchall(
+            "SELECT kind, guild_id, command, uses FROM command_usage"
+        )
+        if not rows:
+            await pool.execute(self.BACKFILL_SQL)
+            rows = await pool.fetchall(
+                "SELECT kind, guild_id, command, uses FROM command_usage"
+            )
+            logger.info("Counted the command history of %d commands", len(rows))
+        for kind, guild_id, command, uses in rows:
+            self.add(kind, guild_id, command, uses)
+
+    def add(self, kind: str, guild_id: int, command: str, uses: int) -> None:
+        """Count written uses of a command"""
+        self.totals[kind] += uses
+        self.guilds[kind, guild_id] += uses
+        self.commands[kind, command] += uses
+
+    def total(self, kind: str, guild_id: int | None = None) -> int:
+        """Uses of every command, in a guild if given"""
+        if guild_id is None:
+            return self.totals.get(kind, 0)
+        return self.guilds.get((kind, guild_id), 0)
+
+    def most_used(self, kind: str, limit: int = 5) -> list[tuple[str, int]]:
+        """The most used commands, as `(command, uses)`"""
+        used = [
+            (command, uses)
+            for (used_kind, command), uses in self.commands.items()
+            if used_kind == kind
+        ]
+        used.sort(key=itemgetter(1), reverse=True)
+        return used[:limit]
+
+
+class HistoryWriter:
+    """Buffers command history and writes it in batches
+
+    Completed commands are only appended in memory, `flush` writes
+    everything buffered with one `executemany` per table
+    in a single transaction. Only users missing from `known_users`
+    are written to the `users` table. The `command_usage` counters are
+    updated in the same transaction.
+
+    Attributes
+    ----------
+    pool : SQL
+        The database to write to
+    usage : CommandUsage
+        The counters to update once written
+    known_users : KnownUsers
+        Users already in the database
+    max_pending : int
+        Rows buffered at most, new rows are dropped past this
+    dropped : int
+        Rows dropped because the buffer was full or the write failed
+    written : int
+        Rows written so far
+    """
+
+    def __init__(
+        self, pool: SQL, usage: CommandUsage, *, max_pending: int = 10_000
+    ) -> None:
+        self.pool = pool
+        self.usage = usage
+        self.max_pending = max_pending
+        self.dropped: int = 0
+        self.written: int = 0
+        self.known_users = KnownUsers(pool)
+        self._users: set[int] = set()
+        self._prefix_commands: list[HistoryRow] = []
+        self._app_commands: list[HistoryRow] = []
+        # the write in flight, shielded so cancelling a flush loses no rows
+        self._writing: asyncio.Task[None] | None = None
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered commands"""
+        return len(self._prefix_commands) + len(self._app_commands)
+
+    def add_prefix_command(
+        self, guild_id: int, author_id: int, command: str, created_at: int
+    ) -> None:
+        """Buffer a prefix command completed at a unix time"""
+        if self.__full():
+            return
+        self._users.add(author_id)
+        self._prefix_commands.append((guild_id, author_id, command, created_at))
+
+    def add_app_command(
+        self,
+        guild_id: int | None,
+        author_id: int,
+        command: str,
+        created_at: int,
+    ) -> None:
+        """Buffer an app command completed at a unix time
+
+        User installed commands have no guild,
+        only their user is recorded.
+        """
+        if self.__full():
+            return
+        self._users.add(author_id)
+        if guild_id is not None:
+            self._app_commands.append(
+                (guild_id, author_id, command, created_at)
+            )
+
+    def __full(self) -> bool:
+        if self.pending < self.max_pending:
+            return False
+        self.dropped += 1
+        metrics.HISTORY_ROWS.inc("dropped")
+        return True
+
+    async def flush(self) -> None:
+        """|coro|
+
+        Write everything buffered
+
+        Cancelling it leaves the write running,
+        the next flush waits for it first.
+        """
+        if self._writing is not None and not self._writing.done():
+            await asyncio.shield(self._writing)
+        if not self._users:
+            return
+        user_ids = self._users
+        prefix_commands = self._prefix_commands
+        app_commands = self._app_commands
+        # swap the buffers first, commands completing meanwhile go to the new
+        self._users = set()
+        self._prefix_commands = []
+        self._app_commands = []
+        self._writing = asyncio.create_task(
+            self.__write(user_ids, prefix_commands, app_commands)
+        )
+        await asyncio.shield(self._writing)
+
+    async def __write(
+        self,
+        user_ids: set[int],
+        prefix_commands: list[HistoryRow],
+        app_commands: list[HistoryRow],
+    ) -> None:
+        rows = len(prefix_commands) + len(app_commands)
+        usage: Counter[UsageKey] = Counter(
+            ("prefix", guild_id, command)
+            for guild_id, _, command, _ in prefix_commands
+        )
+        usage.update(
+            ("app", guild_id, command)
+            for guild_id, _, command, _ in app_commands
+        )
+        try:
+            new_users = await self.known_users.new_users(user_ids)
+            await self.pool.executebatch(
+                (
+                    "INSERT OR IGNORE INTO users (id) VALUES (?)",
+                    [(user_id,) for user_id in new_users],
+                ),
+                (
+                    """
+                    INSERT INTO prefix_commands
+                    (guild_id, author_id, command, created_at)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    prefix_commands,
+                ),
+                (
+                    """
+                    INSERT INTO app_commands
+                    (guild_id, author_id, command, created_at)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    app_commands,
+                ),
+                (
+                    """
+                    INSERT INTO command_usage (kind, guild_id, command, uses)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (kind, guild_id, command)
+                    DO UPDATE SET uses = uses + excluded.uses
+                    """,
+                    [(*key, uses) for key, uses in usage.items()],
+                ),
+            )
+        except Exception:
+            self.dropped += rows
+            metrics.HISTORY_ROWS.inc("dropped", amount=rows)
+            logger.exception("Failed to write %d command history rows", rows)
+        else:
+            self.written += rows
+            metrics.HISTORY_ROWS.inc("written", amount=rows)
+            for user_id in new_users:
+                self.known_users.add(user_id)
+            for (kind, guild_id, command), uses in usage.items():
+                self.usage.add(kind, guild_id, command, uses)
+
+
+class RecentCommands:
+    """The latest commands of every guild, bounded in memory
+
+    Every guild gets a ring buffer of its latest `size` commands.
+    Past `max_guilds` guilds, the ones that used a command the longest
+    time ago are dropped, so at most `size * max_guilds` names are kept.
+
+    Attributes
+    ----------
+    size : int
+        Commands kept per guild
+    max_guilds : int
+        Guilds kept at most
+    """
+
+    def __init__(self, *, size: int = 10, max_guilds: int = 5000) -> None:
+        self.size = size
+        self.max_guilds = max_guilds
+        # least recently used guild first
+        self._guilds: OrderedDict[int, deque[str]] = OrderedDict()
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._guilds
+
+    def __len__(self) -> int:
+        return len(self._guilds)
+
+    def add(self, guild_id: int, command: str) -> None:
+        """Record a command used in a guild"""
+        commands = self._guilds.get(guild_id)
+        if commands is None:
+            commands = self._guilds[guild_id] = deque(maxlen=self.size)
+            while len(self._guilds) > self.max_guilds:
+                self._guilds.popitem(last=False)
+        else:
+            self._guilds.move_to_end(guild_id)
+        commands.append(command)
+
+    def get(self, guild_id: int) -> list[str]:
+        """The latest commands of a guild, oldest first"""
+        commands = self._guilds.get(guild_id)
+        return list(commands) if commands is not None else []
+
+    def dump(self) -> dict[str, list[str]]:
+        """Snapshot the commands, in a JSON serializable format"""
+        return {
+            str(guild_id): list(commands)
+            for guild_id, commands in self._guilds.items()
+        }
+
+    def load(self, data: dict[str, list[str]]) -> None:
+        """Restore a snapshot made by `dump`"""
+        for guild_id, commands in data.items():
+            for command in commands:
+                self.add(int(guild_id), command)
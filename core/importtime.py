@@ -0,0 +1,107 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import argparse
+import subprocess  # ruff: ignore[suspicious-subprocess-import]
+import sys
+from typing import NamedTuple
+
+# Imports everything the bot imports on startup, in the same order
+STARTUP_IMPORTS = (
+    "import importlib, main\n"
+    "from cogs import EXTENSIONS\n"
+    "for extension in EXTENSIONS:\n"
+    "    importlib.import_module(extension)\n"
+)
+DEFAULT_BUDGET_MS = 1500
+DEFAULT_TOP = 15
+
+
+class ImportTime(NamedTuple):
+    """A line of `-X importtime` output"""
+
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def measure() -> list[ImportTime]:
+    """Import the bot in a fresh interpreter with `-X importtime`
+
+    Returns
+    -------
+    list[ImportTime]
+        Import time of every module imported on startup
+    """
+    result = subprocess.run(  # ruff: ignore[subprocess-without-shell-equals-true]
+        [sys.executable, "-X", "importtime", "-c", STARTUP_IMPORTS],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: list[ImportTime] = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[12:].split("|")
+        times.append(
+            ImportTime(module.strip(), int(self_us), int(cumulative_us))
+        )
+    return times
+
+
+def report(times: list[ImportTime], *, top: int) -> str:
+    """Format the top contributors to the startup import time"""
+    total_ms = sum(time.self_us for time in times) / 1000
+    lines = [f"Total import time: {total_ms:.1f}ms ({len(times)} modules)"]
+    lines.append(f"{'self (ms)':>10} {'cumul (ms)':>11}  module")
+    lines.extend(
+        f"{time.self_us / 1000:>10.1f} {time.cumulative_us / 1000:>11.1f}"
+        f"  {time.module}"
+        for time in sorted(times, key=lambda t: t.self_us, reverse=True)[:top]
+    )
+    return "\n".join(lines)
+
+
+def main() -> int:
+    """Check the startup import time against the budget
+
+    Usage: `python -m core.importtime [--budget MS] [--top N]`
+
+    Returns
+    -------
+    int
+        `1` if the budget is exceeded, else `0`
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP)
+    args = parser.parse_args()
+
+    times = measure()
+    sys.stdout.write(report(times, top=args.top) + "\n")
+    total_ms = sum(time.self_us for time in times) / 1000
+    if total_ms > args.budget:
+        sys.stdout.write(
+            f"Over budget: {total_ms:.1f}ms > {args.budget:.1f}ms\n"
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import logging
+from bisect import bisect_left
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+Labels = tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _format_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    pairs = [
+        f'{name}="{_escape(value)}"'
+        for name, value in zip(names, values, strict=True)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Base class of the metrics
+
+    Metrics are only updated from the event loop thread,
+    so updates are plain dict operations without any locking.
+    """
+
+    TYPE: str = ""
+
+    __slots__ = ("documentation", "labelnames", "name")
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Labels
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def render(self) -> list[str]:
+        """Render the metric in Prometheus text format"""
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.TYPE}",
+        ]
+
+
+class Counter(Metric):
+    """A value that only goes up"""
+
+    TYPE = "counter"
+
+    __slots__ = ("values",)
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Labels
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.values: dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """Increase the counter of the label values by `amount`"""
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        return super().render() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Metric):
+    """A value that can go up and down
+
+    Either set directly or computed on scrape by `set_function`.
+    """
+
+    TYPE = "gauge"
+
+    __slots__ = ("function", "values")
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Labels
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.values: dict[Labels, float] = {}
+        self.function: Callable[[], dict[Labels, float]] | None = None
+
+    def set(self, *labels: str, value: float) -> None:
+        """Set the gauge of the label values"""
+        self.values[labels] = value
+
+    def set_function(
+        self, function: Callable[[], dict[Labels, float]] | None
+    ) -> None:
+        """Compute the values with `function` on every scrape
+
+        Pass `None` to stop, the last computed values are dropped.
+        """
+        if function is None:
+            self.values = {}
+        self.function = function
+
+    def render(self) -> list[str]:
+        if self.function is not None:
+            self.values = self.function()
+        return super().render() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Histogram(Metric):
+    """Observations counted in buckets, with their sum"""
+
+    TYPE = "histogram"
+
+    __slots__ = ("buckets", "counts", "sums")
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Labels,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        # the last count is the +Inf bucket
+        self.counts: dict[Labels, list[int]] = {}
+        self.sums: dict[Labels, float] = {}
+
+    def observe(self, *labels: str, value: float) -> None:
+        """Record an observation of the label values"""
+        counts = self.counts.get(labels)
+        if counts is None:
+            counts = self.counts[labels] = [0] * (len(self.buckets) + 1)
+            self.sums[labels] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self.sums[labels] += value
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for labels, counts in self.counts.items():
+            cumulative = 0
+            for bound, count in zip(
+                (*self.buckets, "+Inf"), counts, strict=True
+            ):
+                cumulative += count
+                label = _format_labels(
+                    self.labelnames, labels, f'le="{bound}"'
+                )
+                lines.append(f"{self.name}_bucket{label} {cumulative}")
+            label = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label} {self.sums[labels]}")
+            lines.append(f"{self.name}_count{label} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Holds the metrics to expose"""
+
+    def __init__(self) -> None:
+        self.metrics: list[Metric] = []
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Labels = ()
+    ) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Labels = ()
+    ) -> Gauge:
+        metric = Gauge(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Labels = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Render every metric in Prometheus text format"""
+        lines: list[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+GATEWAY_EVENTS = REGISTRY.counter(
+    "furina_gateway_events_total", "Dispatched gateway events", ("event",)
+)
+COMMANDS = REGISTRY.counter(
+    "furina_commands_total",
+    "Invoked commands",
+    ("command", "kind", "status"),
+)
+COMMAND_DURATION = REGISTRY.histogram(
+    "furina_command_duration_seconds",
+    "Time taken by commands",
+    ("command", "kind"),
+)
+SQL_QUERY_DURATION = REGISTRY.histogram(
+    "furina_sql_query_duration_seconds",
+    "Time taken by database queries",
+    ("method",),
+)
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "furina_http_request_duration_seconds",
+    "Time taken by outbound HTTP requests",
+    ("host", "status"),
+)
+ACTIVE_GAMES = REGISTRY.gauge(
+    "furina_active_games", "Minigames still running", ("game",)
+)
+REST_RATELIMITS = REGISTRY.counter(
+    "furina_rest_ratelimits_total",
+    "Discord API 429 responses",
+    ("route", "scope"),
+)
+REST_REMAINING = REGISTRY.gauge(
+    "furina_rest_ratelimit_remaining",
+    "Requests left in the rate limit window of Discord API routes",
+    ("route",),
+)
+HISTORY_ROWS = REGISTRY.counter(
+    "furina_command_history_rows_total",
+    "Command history rows by what happened to them",
+    ("result",),
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "furina_cache_lookups_total", "Cache lookups", ("cache", "result")
+)
+
+
+async def start_server(host: str, port: int) -> web.AppRunner:
+    """|coro|
+
+    Serve the metrics at `http://host:port/metrics`
+
+    Returns
+    -------
+    web.AppRunner
+        The runner of the server, call `cleanup` on it to stop the server
+    """
+    # `core.utils` imports this module, and `aiohttp.web` is only needed
+    # with the exporter enabled, so neither is imported at startup
+    from core.utils import lazy_import  # ruff: ignore[import-outside-top-level]
+
+    web = lazy_import("aiohttp.web")
+
+    async def metrics_handler(_: web.Request) -> web.Response:  # ruff: ignore[unused-async]
+        return web.Response(
+            text=REGISTRY.render(), content_type="text/plain", charset="utf-8"
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+    return runner
@@ -0,0 +1,114 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from types import CodeType
+
+Stack = tuple[str, ...]
+
+
+class SamplingProfiler:
+    """Samples the call stack of a running thread
+
+    Meant to be run in another thread, so the sampled one
+    only pays for the GIL switches, not for any tracing.
+
+    Attributes
+    ----------
+    thread_id : int
+        Identifier of the sampled thread
+    interval : float
+        Seconds between samples
+    stacks : Counter[Stack]
+        How many times each stack was sampled, outermost frame first
+    """
+
+    def __init__(self, thread_id: int, *, interval: float = 0.005) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[Stack] = Counter()
+        self._labels: dict[CodeType, str] = {}
+        self._cwd = str(Path.cwd())
+
+    @property
+    def samples(self) -> int:
+        """Number of samples taken"""
+        return self.stacks.total()
+
+    def label(self, code: CodeType) -> str:
+        """Name a function as `qualname (file:line)`"""
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            filename = code.co_filename
+            if filename.startswith(self._cwd):
+                filename = filename[len(self._cwd) + 1 :]
+            label = f"{name} ({filename}:{code.co_firstlineno})".replace(
+                ";", ":"
+            )
+            self._labels[code] = label
+        return label
+
+    def run(self, duration: float) -> None:
+        """Sample the thread for `duration` seconds, blocking"""
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            frame = sys._current_frames().get(self.thread_id)
+            stack: list[str] = []
+            while frame is not None:
+                stack.append(self.label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.stacks[tuple(stack)] += 1
+            time.sleep(self.interval)
+
+    def collapsed(self) -> str:
+        """The samples in collapsed stack format
+
+        One `frame;frame;frame count` line per stack,
+        which `flamegraph.pl` and speedscope can read.
+        """
+        return "\n".join(
+            ";".join(stack) + f" {count}"
+            for stack, count in self.stacks.most_common()
+        )
+
+    def top_functions(self, limit: int = 15) -> list[tuple[str, int, int]]:
+        """The functions that were sampled the most
+
+        Returns
+        -------
+        list[tuple[str, int, int]]
+            Function label, self samples and total samples
+            sorted by self samples
+        """
+        own: Counter[str] = Counter()
+        total: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                total[label] += count
+        return [
+            (label, count, total[label])
+            for label, count in own.most_common(limit)
+        ]
@@ -0,0 +1,291 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import time
+import traceback
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import discord
+from discord import ui
+
+from core import settings
+from core.views import LayoutView
+
+if TYPE_CHECKING:
+    from core import FurinaBot
+
+logger = logging.getLogger(__name__)
+
+
+def unwrap(error: BaseException) -> BaseException:
+    """Get the exception wrapped by `CommandInvokeError` and the likes"""
+    while (original := getattr(error, "original", None)) is not None:
+        error = original
+    return error
+
+
+class ErrorGroup:
+    """Every occurrence of an error with the same fingerprint
+
+    Attributes
+    ----------
+    fingerprint : str
+        Short hash of the exception type and where it was raised
+    name : str
+        Qualified name of the exception type
+    location : str
+        `file:line in function` where it was raised
+    message : str
+        Message of the first occurrence
+    traceback : str
+        Traceback of the first occurrence
+    command : str, optional
+        Command of the latest occurrence
+    count : int
+        Occurrences so far
+    reported : int
+        Occurrences already sent in a digest
+    first_seen : float
+        Unix time of the first occurrence
+    last_seen : float
+        Unix time of the latest occurrence
+    """
+
+    __slots__ = (
+        "command",
+        "count",
+        "fingerprint",
+        "first_seen",
+        "last_seen",
+        "location",
+        "message",
+        "name",
+        "reported",
+        "traceback",
+    )
+
+    def __init__(
+        self,
+        fingerprint: str,
+        name: str,
+        location: str,
+        error: BaseException,
+    ) -> None:
+        self.fingerprint = fingerprint
+        self.name = name
+        self.location = location
+        self.message = str(error)
+        self.traceback = "".join(traceback.format_exception(error))
+        self.command: str | None = None
+        self.count: int = 0
+        self.reported: int = 0
+        self.first_seen = self.last_seen = time.time()
+
+
+class ErrorReporter:
+    """Groups errors by fingerprint and reports them as digests
+
+    Only the first occurrence of a fingerprint is logged with its
+    traceback, the following ones are only counted. Every `interval`
+    seconds the fingerprints that occurred since the previous digest are
+    sent to `DEBUG_WEBHOOK` in a single message, so an error storm costs
+    one message per interval.
+
+    Attributes
+    ----------
+    bot : FurinaBot
+        The bot sending the digests
+    interval : float
+        Seconds between digests
+    max_groups : int
+        Fingerprints kept in memory, the least recently seen are dropped
+    per_digest : int
+        Fingerprints detailed in a single digest
+    groups : dict[str, ErrorGroup]
+        Error groups by fingerprint, least recently seen first
+    """
+
+    def __init__(
+        self,
+        bot: FurinaBot,
+        *,
+        interval: float = 60,
+        max_groups: int = 256,
+        per_digest: int = 5,
+    ) -> None:
+        self.bot = bot
+        self.interval = interval
+        self.max_groups = max_groups
+        self.per_digest = per_digest
+        self.groups: dict[str, ErrorGroup] = {}
+        self._cwd = str(Path.cwd())
+
+    def start(self) -> None:
+        """Start sending digests"""
+        self.bot.scheduler.every("error-digest", self.interval, self.digest)
+
+    def fingerprint(self, error: BaseException) -> tuple[str, str, str]:
+        """Fingerprint an error by its type and the frame raising it
+
+        The innermost frame of the bot's own code is used when there is one,
+        so errors raised inside libraries are told apart by their caller.
+
+        Returns
+        -------
+        tuple[str, str, str]
+            The fingerprint, the type name and the location
+        """
+        name = f"{type(error).__module__}.{type(error).__qualname__}"
+        frames = traceback.extract_tb(error.__traceback__)
+        frame = next(
+            (
+                frame
+                for frame in reversed(frames)
+                if frame.filename.startswith(self._cwd)
+                and "site-packages" not in frame.filename
+            ),
+            frames[-1] if frames else None,
+        )
+        if frame is None:
+            location = "unknown"
+        else:
+            filename = frame.filename
+            if filename.startswith(self._cwd):
+                filename = filename[len(self._cwd) + 1 :]
+            location = f"{filename}:{frame.lineno} in {frame.name}"
+        fingerprint = hashlib.blake2b(
+            f"{name}@{location}".encode(), digest_size=4
+        ).hexdigest()
+        return fingerprint, name, location
+
+    def report(
+        self, error: BaseException, *, command: str | None = None
+    ) -> ErrorGroup:
+        """Record an error
+
+        Parameters
+        ----------
+        error : BaseException
+            The error, wrapped ones are unwrapped
+        command : str, optional
+            Qualified name of the command that raised it
+
+        Returns
+        -------
+        ErrorGroup
+            The group the error belongs to
+        """
+        error = unwrap(error)
+        fingerprint, name, location = self.fingerprint(error)
+        group = self.groups.pop(fingerprint, None)
+        if group is None:
+            group = ErrorGroup(fingerprint, name, location, error)
+            logger.error(
+                "Error %s in command %s",
+                fingerprint,
+                command,
+                exc_info=error,
+            )
+            while len(self.groups) >= self.max_groups:
+                del self.groups[next(iter(self.groups))]
+        # re-inserted, so the dict stays ordered by last seen
+        self.groups[fingerprint] = group
+        group.command = command
+        group.count += 1
+        group.last_seen = time.time()
+        return group
+
+    async def digest(self) -> None:
+        """|coro|
+
+        Send the fingerprints that occurred since the previous digest
+        """
+        pending = sorted(
+            (g for g in self.groups.values() if g.count > g.reported),
+            key=lambda group: group.count - group.reported,
+            reverse=True,
+        )
+        if not pending:
+            return
+        container = ui.Container(ui.TextDisplay("## Error Digest"))
+        tracebacks = ""
+        for group in pending[: self.per_digest]:
+            new = group.count - group.reported
+            text = (
+                f"### `{group.fingerprint}` {group.name} x{group.count}"
+                f" (+{new})\n"
+                f"`{group.location}` · `{group.command}`\n"
+                f"First <t:{int(group.first_seen)}:R>"
+                f" · Last <t:{int(group.last_seen)}:R>\n"
+                f">>> {group.message[:200] or '-'}"
+            )
+            if not group.reported:
+                tracebacks += f"[{group.fingerprint}]\n{group.traceback}\n"
+            container.add_item(ui.Separator())
+            container.add_item(ui.TextDisplay(text))
+        overflow = pending[self.per_digest :]
+        if overflow:
+            errors = sum(group.count - group.reported for group in overflow)
+            container.add_item(ui.Separator())
+            container.add_item(
+                ui.TextDisplay(
+                    f"-# And {len(overflow)} more fingerprints"
+                    f" ({errors} errors)"
+                )
+            )
+        for group in pending:
+            logger.warning(
+                "Error %s %s happened %d times (%d new)",
+                group.fingerprint,
+                group.name,
+                group.count,
+                group.count - group.reported,
+            )
+        # errors happening while sending are left for the next digest
+        counts = [(group, group.count) for group in pending]
+        if not settings.DEBUG_WEBHOOK:
+            for group, count in counts:
+                group.reported = count
+            return
+        files: list[discord.File] = []
+        if tracebacks:
+            # tracebacks of the new fingerprints
+            files.append(
+                discord.File(
+                    io.BytesIO(tracebacks.encode("utf-8")),
+                    filename="tracebacks.txt",
+                )
+            )
+            container.add_item(ui.File("attachment://tracebacks.txt"))
+        webhook = discord.Webhook.from_url(
+            settings.DEBUG_WEBHOOK, client=self.bot
+        )
+        await self.bot.rest.call(
+            partial(
+                webhook.send,
+                view=LayoutView(container),
+                files=files,
+                silent=True,
+            )
+        )
+        # only once sent, a failed digest is sent again with the next one
+        for group, count in counts:
+            group.reported = count
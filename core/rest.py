@@ -0,0 +1,345 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import re
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import TYPE_CHECKING, Any
+
+import aiohttp
+
+from core import metrics
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine, Generator
+
+    RestCallback = Callable[[], Coroutine[Any, Any, Any]]
+    QueueItem = tuple[int, int, RestCallback, asyncio.Future[Any] | None]
+
+logger = logging.getLogger(__name__)
+
+# whether the current task is marked by `RestScheduler.interactive`
+_interactive: ContextVar[bool] = ContextVar("interactive", default=False)
+
+SNOWFLAKE_REGEX = re.compile(r"\d{15,20}")
+TOKEN_REGEX = re.compile(r"(/(?:webhooks|interactions)/\{id\}/)[^/]+")
+REACTION_REGEX = re.compile(r"/reactions/[^/]+")
+
+
+def route_template(method: str, path: str) -> str:
+    """Turn a request into its route, like `PUT /channels/{id}/messages`
+
+    IDs, webhook and interaction tokens and emojis are replaced so every
+    request to the same route is counted together, and no token is kept.
+    """
+    path = SNOWFLAKE_REGEX.sub("{id}", path)
+    path = TOKEN_REGEX.sub(r"\1{token}", path)
+    path = REACTION_REGEX.sub("/reactions/{emoji}", path)
+    return f"{method} {path}"
+
+
+class RouteStats:
+    """Rate limit state of a Discord API route, from its latest response
+
+    Attributes
+    ----------
+    bucket : str, optional
+        Discord's rate limit bucket hash of the route
+    limit : int
+        Requests allowed per window
+    remaining : int
+        Requests left in the current window
+    reset_at : float
+        Unix time when the window resets
+    requests : int
+        Requests made to the route
+    ratelimited : int
+        Requests that got a 429 response
+    """
+
+    __slots__ = (
+        "bucket",
+        "limit",
+        "ratelimited",
+        "remaining",
+        "requests",
+        "reset_at",
+    )
+
+    def __init__(self) -> None:
+        self.bucket: str | None = None
+        self.limit: int = 0
+        self.remaining: int = 0
+        self.reset_at: float = 0.0
+        self.requests: int = 0
+        self.ratelimited: int = 0
+
+
+class RateLimitTracker:
+    """Records the rate limit headers of every Discord API response
+
+    Pass `trace_config` as `http_trace` to the client.
+
+    Attributes
+    ----------
+    routes : OrderedDict[str, RouteStats]
+        Stats by route, see `route_template`, least recently used first
+    max_routes : int
+        Routes kept at most
+    trace_config : aiohttp.TraceConfig
+        The trace config reading the responses
+    """
+
+    def __init__(self, *, max_routes: int = 500) -> None:
+        self.max_routes = max_routes
+        self.routes: OrderedDict[str, RouteStats] = OrderedDict()
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_request_end.append(self.__on_request_end)
+        metrics.REST_REMAINING.set_function(self.__remaining_metric)
+
+    async def __on_request_end(
+        self,
+        _: aiohttp.ClientSession,
+        __: Any,
+        params: aiohttp.TraceRequestEndParams,
+    ) -> None:
+        route = route_template(params.method, params.url.path)
+        stats = self.routes.get(route)
+        if stats is None:
+            stats = self.routes[route] = RouteStats()
+            while len(self.routes) > self.max_routes:
+                self.routes.popitem(last=False)
+        else:
+            self.routes.move_to_end(route)
+        stats.requests += 1
+        response = params.response
+        headers = response.headers
+        remaining = headers.get("X-Ratelimit-Remaining")
+        if remaining is not None:
+            stats.bucket = headers.get("X-Ratelimit-Bucket")
+            stats.limit = int(headers.get("X-Ratelimit-Limit", 0))
+            stats.remaining = int(remaining)
+            stats.reset_at = time.time() + float(
+                headers.get("X-Ratelimit-Reset-After", 0)
+            )
+        if response.status == 429:
+            stats.ratelimited += 1
+            scope = headers.get("X-Ratelimit-Scope", "user")
+            metrics.REST_RATELIMITS.inc(route, scope)
+
+    def __remaining_metric(self) -> dict[tuple[str, ...], float]:
+        return {
+            (route,): stats.remaining
+            for route, stats in self.routes.items()
+            if stats.limit
+        }
+
+
+class Priority(IntEnum):
+    """Priority of a background REST call, lower runs first"""
+
+    NORMAL = 0
+    LOW = 1
+
+
+class RestScheduler:
+    """Runs non-interactive REST calls when the bot is not busy
+
+    Background calls are queued by priority and run one at a time,
+    each waiting until no user-facing work is in flight, up to
+    `idle_timeout` seconds so they are never starved.
+    User-facing work is marked with `interactive`.
+
+    Usage
+    -----
+    .. code-block:: python
+        # wait for the result
+        emoji = await bot.rest.call(
+            partial(bot.create_application_emoji, name=name, image=image),
+            priority=Priority.LOW,
+        )
+        # fire and forget, failures are logged
+        bot.rest.defer(partial(message.forward, owner))
+
+    Attributes
+    ----------
+    idle_timeout : float
+        Max seconds a background call waits for the bot to be idle
+    delayed : int
+        Background calls that had to wait for user-facing work
+    forced : int
+        Background calls that ran after waiting `idle_timeout`
+    """
+
+    def __init__(self, *, idle_timeout: float = 5.0) -> None:
+        self.idle_timeout = idle_timeout
+        self.delayed: int = 0
+        self.forced: int = 0
+        self._queue: asyncio.PriorityQueue[QueueItem] = (
+            asyncio.PriorityQueue()
+        )
+        # keeps calls of the same priority in order
+        self._sequence = itertools.count()
+        self._interactive: int = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._worker: asyncio.Task[None] | None = None
+
+    @property
+    def pending(self) -> int:
+        """Number of queued background calls"""
+        return self._queue.qsize()
+
+    @property
+    def busy(self) -> int:
+        """Number of user-facing works in flight"""
+        return self._interactive
+
+    def start(self) -> None:
+        """Start running the queued calls"""
+        self._worker = asyncio.create_task(self.__work())
+
+    async def close(self) -> None:
+        """|coro|
+
+        Stop the worker and cancel the queued calls
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+        while not self._queue.empty():
+            *_, future = self._queue.get_nowait()
+            if future is not None:
+                future.cancel()
+
+    @contextmanager
+    def interactive(self) -> Generator[None, None, None]:
+        """Mark user-facing work, background calls wait until it is done
+
+        Nesting it in the same task counts once.
+        """
+        if _interactive.get():
+            yield
+            return
+        token = _interactive.set(True)
+        self.__raise()
+        try:
+            yield
+        finally:
+            self.__lower()
+            _interactive.reset(token)
+
+    @contextmanager
+    def paused(self) -> Generator[None, None, None]:
+        """Lift `interactive` while the work waits on the user,
+        like a prompt or a modal
+        """
+        if not _interactive.get():
+            yield
+            return
+        token = _interactive.set(False)
+        self.__lower()
+        try:
+            yield
+        finally:
+            self.__raise()
+            _interactive.reset(token)
+
+    def __raise(self) -> None:
+        self._interactive += 1
+        self._idle.clear()
+
+    def __lower(self) -> None:
+        self._interactive -= 1
+        if not self._interactive:
+            self._idle.set()
+
+    async def call(
+        self, callback: RestCallback, *, priority: Priority = Priority.NORMAL
+    ) -> Any:
+        """|coro|
+
+        Queue a background call and wait for its result
+
+        Parameters
+        ----------
+        callback : Callable[[], Coroutine]
+            The coroutine function making the REST call
+        priority : Priority, optional
+            Priority of the call, default is `Priority.NORMAL`
+
+        Returns
+        -------
+        Any
+            What `callback` returned
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(
+            (priority, next(self._sequence), callback, future)
+        )
+        return await future
+
+    def defer(
+        self, callback: RestCallback, *, priority: Priority = Priority.NORMAL
+    ) -> None:
+        """Queue a background call without waiting for it
+
+        Failures are logged.
+
+        Parameters
+        ----------
+        callback : Callable[[], Coroutine]
+            The coroutine function making the REST call
+        priority : Priority, optional
+            Priority of the call, default is `Priority.NORMAL`
+        """
+        self._queue.put_nowait(
+            (priority, next(self._sequence), callback, None)
+        )
+
+    async def __work(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if not self._idle.is_set():
+                self.delayed += 1
+                try:
+                    await asyncio.wait_for(
+                        self._idle.wait(), self.idle_timeout
+                    )
+                except asyncio.TimeoutError:
+                    self.forced += 1
+                # something more important may have been queued meanwhile
+                self._queue.put_nowait(item)
+                item = self._queue.get_nowait()
+            *_, callback, future = item
+            if future is not None and future.done():
+                # the caller gave up waiting
+                continue
+            try:
+                result = await callback()
+            except Exception as e:
+                if future is None:
+                    logger.exception("Background REST call failed")
+                elif not future.done():
+                    future.set_exception(e)
+            else:
+                if future is not None and not future.done():
+                    future.set_result(result)
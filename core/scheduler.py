@@ -0,0 +1,231 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from core.stats import LatencyWindow
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine
+
+    JobCallback = Callable[[], Coroutine[None, None, object]]
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """A job registered to the `Scheduler`
+
+    Attributes
+    ----------
+    name : str
+        Unique name of the job
+    interval : float, optional
+        Seconds between runs, `None` for one-shot jobs
+    jitter : float
+        Fraction of `interval` each run is randomly moved by
+    runtime : LatencyWindow
+        How long the runs took
+    lag : LatencyWindow
+        How late the runs started compared to when they were due
+    skipped : int
+        Runs skipped because the previous one was still running
+    failures : int
+        Consecutive failed runs, reset on success
+    """
+
+    def __init__(
+        self,
+        name: str,
+        callback: JobCallback,
+        *,
+        interval: float | None,
+        jitter: float,
+        next_run: float,
+    ) -> None:
+        self.name = name
+        self.callback = callback
+        self.interval = interval
+        self.jitter = jitter
+        self.next_run = next_run
+        self.runtime = LatencyWindow()
+        self.lag = LatencyWindow()
+        self.skipped: int = 0
+        self.failures: int = 0
+        self.running: asyncio.Task[None] | None = None
+        self.supervisor: asyncio.Task[None] | None = None
+
+
+class Scheduler:
+    """Runs the bot's background jobs
+
+    Recurring jobs are spread out with jitter so they don't run at the same
+    time, a run is skipped if the previous one is still going,
+    and a failing job is retried with exponential backoff.
+
+    Usage
+    -----
+    .. code-block:: python
+        bot.scheduler.every("flush-something", 5, self.flush)
+        bot.scheduler.once("delete-message", 10, message.delete)
+    """
+
+    def __init__(self, *, max_backoff: float = 300) -> None:
+        self.max_backoff = max_backoff
+        self.jobs: dict[str, Job] = {}
+        # only used for jitter
+        self._rng = random.Random()  # ruff: ignore[suspicious-non-cryptographic-random-usage]
+
+    def every(
+        self,
+        name: str,
+        interval: float,
+        callback: JobCallback,
+        *,
+        jitter: float = 0.1,
+        delay: float | None = None,
+    ) -> Job:
+        """Run `callback` every `interval` seconds
+
+        Registering a job with the name of an existing one replaces it.
+
+        Parameters
+        ----------
+        name : str
+            Unique name of the job
+        interval : float
+            Seconds between runs
+        callback : Callable[[], Coroutine]
+            The coroutine function to run
+        jitter : float, optional
+            Fraction of `interval` each run is randomly moved by,
+            default is `0.1`
+        delay : float, optional
+            Seconds before the first run, default is a jittered `interval`
+
+        Returns
+        -------
+        Job
+            The registered job
+        """
+        loop = asyncio.get_running_loop()
+        job = Job(name, callback, interval=interval, jitter=jitter, next_run=0)
+        job.next_run = loop.time() + (
+            self.__jittered(job) if delay is None else delay
+        )
+        return self.__register(job)
+
+    def once(self, name: str, delay: float, callback: JobCallback) -> Job:
+        """Run `callback` once after `delay` seconds
+
+        Parameters
+        ----------
+        name : str
+            Unique name of the job
+        delay : float
+            Seconds before the run
+        callback : Callable[[], Coroutine]
+            The coroutine function to run
+
+        Returns
+        -------
+        Job
+            The registered job
+        """
+        loop = asyncio.get_running_loop()
+        job = Job(
+            name,
+            callback,
+            interval=None,
+            jitter=0,
+            next_run=loop.time() + delay,
+        )
+        return self.__register(job)
+
+    def cancel(self, name: str) -> None:
+        """Cancel a job and its current run"""
+        job = self.jobs.pop(name, None)
+        if job is None:
+            return
+        for task in (job.supervisor, job.running):
+            if task is not None:
+                task.cancel()
+
+    async def close(self) -> None:
+        """|coro|
+
+        Cancel every job
+        """
+        for name in tuple(self.jobs):
+            self.cancel(name)
+
+    def __register(self, job: Job) -> Job:
+        self.cancel(job.name)
+        self.jobs[job.name] = job
+        job.supervisor = asyncio.create_task(self.__supervise(job))
+        return job
+
+    def __jittered(self, job: Job) -> float:
+        assert job.interval is not None
+        offset = self._rng.uniform(-job.jitter, job.jitter)
+        return job.interval * (1 + offset)
+
+    def __backoff(self, job: Job) -> float:
+        assert job.interval is not None
+        return min(job.interval * 2**job.failures, self.max_backoff)
+
+    async def __supervise(self, job: Job) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(max(job.next_run - loop.time(), 0))
+            job.lag.add(max(loop.time() - job.next_run, 0))
+            if job.running is not None and not job.running.done():
+                job.skipped += 1
+                logger.warning("Skipped job %s, still running", job.name)
+            else:
+                job.running = asyncio.create_task(self.__run(job))
+                # wait up to one period, so a failed run can delay the next
+                await asyncio.wait((job.running,), timeout=job.interval)
+            if job.interval is None:
+                if self.jobs.get(job.name) is job:
+                    del self.jobs[job.name]
+                return
+            if job.failures:
+                job.next_run = loop.time() + self.__backoff(job)
+            else:
+                job.next_run = max(
+                    job.next_run + self.__jittered(job), loop.time()
+                )
+
+    async def __run(self, job: Job) -> None:
+        failed = False
+        start = perf_counter()
+        try:
+            await job.callback()
+        except Exception:
+            failed = True
+            job.failures += 1
+            logger.exception(
+                "Job %s failed (%d in a row)", job.name, job.failures
+            )
+        else:
+            job.failures = 0
+        finally:
+            job.runtime.add(perf_counter() - start, failed=failed)
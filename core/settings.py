@@ -24,6 +24,13 @@ ACTIVITY_NAME = "Wordle ▪ /minigame wordle"
 TOKEN = os.getenv("BOT_TOKEN", "")
 DEBUG_WEBHOOK = os.getenv("DEBUG_WEBHOOK", "")
 OWNER_ID = 596886610214125598
+# Seconds between polls for cache changes made by other bot processes
+INVALIDATION_POLL_INTERVAL = float(
+    os.getenv("INVALIDATION_POLL_INTERVAL", "2")
+)
+# Prometheus metrics server, only started when a port is set
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
 
 # Emotes
 CHECKMARK = "<a:check:1238796460569657375>"
@@ -15,10 +15,14 @@ limitations under the License.
 from __future__ import annotations
 
 import typing
+from time import perf_counter
 from typing import TYPE_CHECKING
 
+from core.metrics import SQL_QUERY_DURATION
+
 if TYPE_CHECKING:
     import sqlite3
+    from collections.abc import Iterable
 
     import asqlite
 
@@ -35,6 +39,16 @@ USERS_SQL = """
         id INTEGER NOT NULL PRIMARY KEY
     )
 """
+CACHE_INVALIDATIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS cache_invalidations
+    (
+        id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+        topic TEXT NOT NULL,
+        key TEXT NOT NULL,
+        origin TEXT NOT NULL,
+        created_at INTEGER NOT NULL
+    )
+"""
 # Events Cog
 PREFIX_COMMANDS_SQL = """
     CREATE TABLE IF NOT EXISTS prefix_commands
@@ -42,6 +56,7 @@ PREFIX_COMMANDS_SQL = """
         guild_id INTEGER NOT NULL,
         author_id INTEGER NOT NULL,
         command TEXT NOT NULL,
+        created_at INTEGER, -- unix time, unknown for older rows
         FOREIGN KEY (guild_id) REFERENCES guilds (id),
         FOREIGN KEY (author_id) REFERENCES users (id)
     )
@@ -52,10 +67,21 @@ APP_COMMANDS_SQL = """
         guild_id INTEGER NOT NULL,
         author_id INTEGER NOT NULL,
         command TEXT NOT NULL,
+        created_at INTEGER, -- unix time, unknown for older rows
         FOREIGN KEY (guild_id) REFERENCES guilds (id),
         FOREIGN KEY (author_id) REFERENCES users (id)
     )
 """
+COMMAND_USAGE_SQL = """
+    CREATE TABLE IF NOT EXISTS command_usage
+    (
+        kind TEXT NOT NULL, -- prefix or app
+        guild_id INTEGER NOT NULL,
+        command TEXT NOT NULL,
+        uses INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (kind, guild_id, command)
+    )
+"""
 # Gacha Cog
 GI_UID_SQL = """
     CREATE TABLE IF NOT EXISTS gi_uid
@@ -120,45 +146,101 @@ class SQL:
         self.create_table_queries = [
             GUILDS_SQL,
             USERS_SQL,
+            CACHE_INVALIDATIONS_SQL,
             CUSTOM_PREFIX_SQL,
             PREFIX_COMMANDS_SQL,
             APP_COMMANDS_SQL,
+            COMMAND_USAGE_SQL,
             GI_UID_SQL,
             HSR_UID_SQL,
             VALID_WORDLE_GUESSES_SQL,
             SINGLEPLAYER_GAMES_SQL,
             TWOPLAYERS_GAMES_SQL,
         ]
+        # columns added after their table was created,
+        # in `(table, column, definition)` format
+        self.added_columns = [
+            ("prefix_commands", "created_at", "INTEGER"),
+            ("app_commands", "created_at", "INTEGER"),
+        ]
 
     async def create_tables(self) -> None:
         async with self.pool.acquire() as conn, conn.transaction():
             for query in self.create_table_queries:
                 await conn.execute(query)
+            for table, column, definition in self.added_columns:
+                rows = await conn.fetchall(f"PRAGMA table_info({table})")
+                if column not in {row["name"] for row in rows}:
+                    await conn.execute(
+                        f"ALTER TABLE {table} ADD COLUMN {column} {definition}"
+                    )
 
     async def execute(self, query: str, *args: typing.Any) -> None:
-        async with self.pool.acquire() as conn:
-            await conn.execute(query, *args)
+        start = perf_counter()
+        try:
+            async with self.pool.acquire() as conn:
+                await conn.execute(query, *args)
+        finally:
+            SQL_QUERY_DURATION.observe("execute", value=perf_counter() - start)
 
     async def executemany(self, query: str, *args: typing.Any) -> None:
-        async with self.pool.acquire() as conn, conn.transaction():
-            await conn.executemany(query, *args)
+        start = perf_counter()
+        try:
+            async with self.pool.acquire() as conn, conn.transaction():
+                await conn.executemany(query, *args)
+        finally:
+            SQL_QUERY_DURATION.observe(
+                "executemany", value=perf_counter() - start
+            )
+
+    async def executebatch(
+        self, *batches: tuple[str, Iterable[Iterable[typing.Any]]]
+    ) -> None:
+        """Run `executemany` for every `(query, rows)` in one transaction"""
+        start = perf_counter()
+        try:
+            async with self.pool.acquire() as conn, conn.transaction():
+                for query, rows in batches:
+                    await conn.executemany(query, rows)
+        finally:
+            SQL_QUERY_DURATION.observe(
+                "executebatch", value=perf_counter() - start
+            )
 
     async def fetchall(
         self, query: str, *args: typing.Any
     ) -> list[sqlite3.Row]:
-        async with self.pool.acquire() as conn:
-            return await conn.fetchall(query, *args)
+        start = perf_counter()
+        try:
+            async with self.pool.acquire() as conn:
+                return await conn.fetchall(query, *args)
+        finally:
+            SQL_QUERY_DURATION.observe(
+                "fetchall", value=perf_counter() - start
+            )
 
     async def fetchone(self, query: str, *args: typing.Any) -> sqlite3.Row:
-        async with self.pool.acquire() as conn:
-            return await conn.fetchone(query, *args)
+        start = perf_counter()
+        try:
+            async with self.pool.acquire() as conn:
+                return await conn.fetchone(query, *args)
+        finally:
+            SQL_QUERY_DURATION.observe(
+                "fetchone", value=perf_counter() - start
+            )
 
     async def fetchval(
         self, query: str, *args: typing.Any
     ) -> typing.Any | None:
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchone(query, *args)
-            return None if not row else row[0]
+        start = perf_counter()
+        try:
+            async with self.pool.acquire() as conn:
+                row = await conn.fetchone(query, *args)
+                return None if not row else row[0]
+        finally:
+            SQL_QUERY_DURATION.observe(
+                "fetchval", value=perf_counter() - start
+            )
 
 
 # Tags Cog
@@ -169,7 +251,7 @@ TAGS_SQL = """
         owner INTEGER NOT NULL,
         name TEXT NOT NULL,
         content TEXT NOT NULL,
-        created_at INTEGER NOT NULL,
+        created_at INTEGER NOT NULL, -- unix time in milliseconds
         uses INTEGER DEFAULT 0,
         PRIMARY KEY (guild_id, name)
     )
@@ -181,7 +263,7 @@ TAG_ALIASES_SQL = """
         owner INTEGER NOT NULL, -- owner of the alias, not the tag owner
         name TEXT NOT NULL, -- original tag name
         alias TEXT NOT NULL,
-        created_at INTEGER NOT NULL,
+        created_at INTEGER NOT NULL, -- unix time in milliseconds
         uses INTEGER DEFAULT 0,
         PRIMARY KEY (guild_id, name, alias),
         FOREIGN KEY (guild_id, name)
@@ -189,6 +271,67 @@ TAG_ALIASES_SQL = """
         ON DELETE CASCADE
     )
 """
+# aliases are unique in a guild, so they resolve with a single lookup
+TAG_ALIASES_ALIAS_INDEX_SQL = """
+    CREATE UNIQUE INDEX IF NOT EXISTS tag_aliases_alias
+    ON tag_aliases (guild_id, alias)
+"""
+# keeps the oldest of the aliases sharing a name before indexing them
+TAG_ALIASES_DEDUPLICATE_SQL = """
+    DELETE FROM tag_aliases
+    WHERE rowid NOT IN (
+        SELECT MIN(rowid) FROM tag_aliases GROUP BY guild_id, alias
+    )
+"""
+# `created_at` used to be stored as `str(datetime)`
+TAGS_EPOCH_MS_SQL = """
+    UPDATE {table}
+    SET created_at = CAST(
+        ROUND((julianday(created_at) - 2440587.5) * 86400000) AS INTEGER
+    )
+    WHERE typeof(created_at) = 'text'
+"""
+# `PRAGMA user_version` of the tags database once migrated
+TAGS_SCHEMA_VERSION = 2
+# full-text search over the tags, reading the content from `tags` by rowid.
+# `guild_id` is indexed as a token, searches match it in the FTS query
+# rather than filtering every guild's matches afterwards.
+# `tags` has no INTEGER PRIMARY KEY, so its rowids may change on VACUUM,
+# run `INSERT INTO tags_fts (tags_fts) VALUES ('rebuild')` after one.
+TAGS_FTS_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS tags_fts USING fts5
+    (
+        guild_id,
+        name,
+        content,
+        content = 'tags',
+        content_rowid = 'rowid'
+    )
+"""
+TAGS_FTS_INSERT_TRIGGER_SQL = """
+    CREATE TRIGGER IF NOT EXISTS tags_fts_insert AFTER INSERT ON tags
+    BEGIN
+        INSERT INTO tags_fts (rowid, guild_id, name, content)
+        VALUES (new.rowid, new.guild_id, new.name, new.content);
+    END
+"""
+TAGS_FTS_DELETE_TRIGGER_SQL = """
+    CREATE TRIGGER IF NOT EXISTS tags_fts_delete AFTER DELETE ON tags
+    BEGIN
+        INSERT INTO tags_fts (tags_fts, rowid, guild_id, name, content)
+        VALUES ('delete', old.rowid, old.guild_id, old.name, old.content);
+    END
+"""
+TAGS_FTS_UPDATE_TRIGGER_SQL = """
+    CREATE TRIGGER IF NOT EXISTS tags_fts_update
+    AFTER UPDATE OF name, content ON tags
+    BEGIN
+        INSERT INTO tags_fts (tags_fts, rowid, guild_id, name, content)
+        VALUES ('delete', old.rowid, old.guild_id, old.name, old.content);
+        INSERT INTO tags_fts (rowid, guild_id, name, content)
+        VALUES (new.rowid, new.guild_id, new.name, new.content);
+    END
+"""
 
 
 class TagSQL(SQL):
@@ -196,4 +339,48 @@ class TagSQL(SQL):
 
     def __init__(self, pool: asqlite.Pool) -> None:
         self.pool = pool
-        self.create_table_queries = [TAGS_SQL, TAG_ALIASES_SQL]
+        self.create_table_queries = [
+            TAGS_SQL,
+            TAG_ALIASES_SQL,
+            TAGS_FTS_SQL,
+            TAGS_FTS_INSERT_TRIGGER_SQL,
+            TAGS_FTS_DELETE_TRIGGER_SQL,
+            TAGS_FTS_UPDATE_TRIGGER_SQL,
+        ]
+        self.added_columns = []
+
+    async def create_tables(self) -> None:
+        """Create the tables, migrating the ones of older versions"""
+        existing = {
+            row["name"]
+            for row in await self.fetchall("SELECT name FROM sqlite_master")
+        }
+        version = await self.fetchval("PRAGMA user_version")
+        if version < 2 and "tags_fts" in existing:
+            # `tags_fts` and its triggers gained `guild_id`, recreated below
+            async with self.pool.acquire() as conn, conn.transaction():
+                await conn.execute("DROP TABLE tags_fts")
+                for trigger in ("insert", "delete", "update"):
+                    await conn.execute(
+                        f"DROP TRIGGER IF EXISTS tags_fts_{trigger}"
+                    )
+            existing.discard("tags_fts")
+        await super().create_tables()
+        if "tags_fts" not in existing:
+            await self.execute(
+                """INSERT INTO tags_fts (tags_fts) VALUES ('rebuild')"""
+            )
+        if "tag_aliases_alias" not in existing:
+            async with self.pool.acquire() as conn, conn.transaction():
+                await conn.execute(TAG_ALIASES_DEDUPLICATE_SQL)
+                await conn.execute(TAG_ALIASES_ALIAS_INDEX_SQL)
+        if version < TAGS_SCHEMA_VERSION:
+            async with self.pool.acquire() as conn, conn.transaction():
+                if version < 1:
+                    for table in ("tags", "tag_aliases"):
+                        await conn.execute(
+                            TAGS_EPOCH_MS_SQL.format(table=table)
+                        )
+                await conn.execute(
+                    f"PRAGMA user_version = {TAGS_SCHEMA_VERSION}"
+                )
@@ -0,0 +1,383 @@
+"""
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import time
+from array import array
+from collections import OrderedDict, defaultdict, deque
+from typing import TYPE_CHECKING, Any, ClassVar, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Sequence
+
+SPARK_BARS = "▁▂▃▄▅▆▇█"
+
+
+class LatencyWindow:
+    """Rolling window of the latest latency samples
+
+    Percentiles are computed from the last `size` samples only,
+    while `count`, `errors` and `total` cover the whole lifetime.
+
+    Attributes
+    ----------
+    count : int
+        Number of recorded samples
+    errors : int
+        Number of samples recorded as failed
+    total : float
+        Sum of all recorded samples, in seconds
+    max : float
+        Highest recorded sample, in seconds
+    """
+
+    __slots__ = ("count", "errors", "max", "samples", "total")
+
+    def __init__(self, size: int = 256) -> None:
+        self.samples: deque[float] = deque(maxlen=size)
+        self.count: int = 0
+        self.errors: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+    def add(self, seconds: float, *, failed: bool = False) -> None:
+        """Record a sample
+
+        Parameters
+        ----------
+        seconds : float
+            The latency to record
+        failed : bool, optional
+            Whether this sample ended with an error
+        """
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if failed:
+            self.errors += 1
+
+    def percentiles(self, *qs: float) -> tuple[float, ...]:
+        """Get percentiles of the samples in the window
+
+        Parameters
+        ----------
+        *qs : float
+            The percentiles to get, from `0` to `100`
+
+        Returns
+        -------
+        tuple[float, ...]
+            The percentiles in the same order, `0.0` if there are no samples
+        """
+        if not self.samples:
+            return tuple(0.0 for _ in qs)
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return tuple(ordered[round(last * q / 100)] for q in qs)
+
+
+def redact(arguments: Iterable[tuple[str, Any]]) -> str:
+    """Describe command arguments without their values
+
+    Only the type is kept, and the length for strings,
+    like `word=<str:5>, user=<Member>`.
+    """
+    described: list[str] = []
+    for name, value in arguments:
+        kind = type(value).__name__
+        if isinstance(value, str):
+            kind = f"{kind}:{len(value)}"
+        described.append(f"{name}=<{kind}>")
+    return ", ".join(described)
+
+
+class SlowInvocation(NamedTuple):
+    """A slow command invocation, see `CommandLatencies.slowest`"""
+
+    seconds: float
+    # breaks ties on `seconds`, the fields after it can not be compared
+    sequence: int
+    command: str
+    guild_id: int | None
+    arguments: str
+    at: float
+
+
+class CommandLatencies:
+    """Run time of the commands, per command and per guild
+
+    Attributes
+    ----------
+    commands : defaultdict[str, LatencyWindow]
+        Run times by command qualified name
+    guilds : OrderedDict[tuple[int, str], LatencyWindow]
+        Run times by guild and command, least recently used first,
+        only the latest `max_guild_windows` are kept
+    keep_slowest : int
+        How many of the slowest invocations to keep
+    max_guild_windows : int
+        Guild and command pairs kept at most
+    """
+
+    def __init__(
+        self, *, keep_slowest: int = 10, max_guild_windows: int = 2000
+    ) -> None:
+        self.keep_slowest = keep_slowest
+        self.max_guild_windows = max_guild_windows
+        self.commands: defaultdict[str, LatencyWindow] = defaultdict(
+            LatencyWindow
+        )
+        self.guilds: OrderedDict[tuple[int, str], LatencyWindow] = (
+            OrderedDict()
+        )
+        # min-heap, the fastest of the slowest is replaced first
+        self._slowest: list[SlowInvocation] = []
+        self._sequence = itertools.count()
+
+    def is_slowest(self, seconds: float) -> bool:
+        """Whether an invocation this long would be one of the slowest"""
+        return (
+            len(self._slowest) < self.keep_slowest
+            or seconds > self._slowest[0].seconds
+        )
+
+    def record(
+        self,
+        command: str,
+        guild_id: int | None,
+        seconds: float,
+        *,
+        failed: bool = False,
+        arguments: Callable[[], str] | None = None,
+    ) -> None:
+        """Record the run time of an invocation
+
+        Parameters
+        ----------
+        command : str
+            Qualified name of the command
+        guild_id : int, optional
+            The guild it was invoked in
+        seconds : float
+            How long it took
+        failed : bool, optional
+            Whether it ended with an error
+        arguments : Callable[[], str], optional
+            Returns the redacted arguments, only called when the invocation
+            is one of the slowest
+        """
+        self.commands[command].add(seconds, failed=failed)
+        if guild_id is not None:
+            key = (guild_id, command)
+            window = self.guilds.get(key)
+            if window is None:
+                window = self.guilds[key] = LatencyWindow(64)
+                while len(self.guilds) > self.max_guild_windows:
+                    self.guilds.popitem(last=False)
+            else:
+                self.guilds.move_to_end(key)
+            window.add(seconds, failed=failed)
+        if self.is_slowest(seconds):
+            invocation = SlowInvocation(
+                seconds,
+                next(self._sequence),
+                command,
+                guild_id,
+                arguments() if arguments is not None else "",
+                time.time(),
+            )
+            if len(self._slowest) < self.keep_slowest:
+                heapq.heappush(self._slowest, invocation)
+            else:
+                heapq.heapreplace(self._slowest, invocation)
+
+    def slowest(self) -> list[SlowInvocation]:
+        """The slowest invocations, slowest first"""
+        return sorted(self._slowest, reverse=True)
+
+    def of_guild(self, guild_id: int) -> dict[str, LatencyWindow]:
+        """Run times of the commands used in a guild"""
+        return {
+            command: window
+            for (guild, command), window in self.guilds.items()
+            if guild == guild_id
+        }
+
+
+def sparkline(values: Sequence[int]) -> str:
+    """Render counts as a line of bars, scaled to the highest"""
+    peak = max(values, default=0)
+    if not peak:
+        return SPARK_BARS[0] * len(values)
+    top = len(SPARK_BARS) - 1
+    return "".join(SPARK_BARS[round(value / peak * top)] for value in values)
+
+
+class BucketRing:
+    """Counts in fixed width time buckets, only the latest `size` are kept
+
+    Buckets are numbered `timestamp // width`, each stored at
+    `number % size`, so old buckets are overwritten as time goes on.
+
+    Attributes
+    ----------
+    width : int
+        Seconds covered by a bucket
+    size : int
+        Buckets kept
+    last : int
+        Number of the latest bucket
+    """
+
+    __slots__ = ("counts", "last", "size", "width")
+
+    def __init__(self, width: int, size: int) -> None:
+        self.width = width
+        self.size = size
+        self.counts: array[int] = array("I", bytes(4 * size))
+        self.last: int = 0
+
+    def add(self, timestamp: float, amount: int = 1) -> None:
+        """Count something happening at a unix time"""
+        bucket = int(timestamp // self.width)
+        self.advance(bucket)
+        if bucket > self.last - self.size:
+            self.counts[bucket % self.size] += amount
+
+    def advance(self, bucket: int) -> None:
+        """Move to a newer bucket, emptying the skipped ones"""
+        if bucket <= self.last:
+            return
+        first = max(self.last + 1, bucket - self.size + 1)
+        for skipped in range(first, bucket + 1):
+            self.counts[skipped % self.size] = 0
+        self.last = bucket
+
+    def series(self, now: float) -> list[int]:
+        """The counts of the latest buckets up to `now`, oldest first"""
+        self.advance(int(now // self.width))
+        return [
+            self.counts[bucket % self.size]
+            for bucket in range(self.last - self.size + 1, self.last + 1)
+        ]
+
+
+class ActivityTimeline:
+    """Activity counted at minute, hour and day resolutions
+
+    Attributes
+    ----------
+    rings : dict[str, BucketRing]
+        Counts by resolution name
+    """
+
+    __slots__ = ("rings",)
+
+    # name: (bucket width, buckets kept)
+    RESOLUTIONS: ClassVar[dict[str, tuple[int, int]]] = {
+        "minute": (60, 60),
+        "hour": (3600, 48),
+        "day": (86400, 30),
+    }
+
+    def __init__(self) -> None:
+        self.rings = {
+            name: BucketRing(width, size)
+            for name, (width, size) in self.RESOLUTIONS.items()
+        }
+
+    def add(self, timestamp: float) -> None:
+        """Count an event at every resolution"""
+        for ring in self.rings.values():
+            ring.add(timestamp)
+
+    def dump(self) -> dict[str, list[int]]:
+        """Snapshot the counts as `{resolution: [last, *counts]}`"""
+        return {
+            name: [ring.last, *ring.counts] for name, ring in self.rings.items()
+        }
+
+    def load(self, data: dict[str, list[int]]) -> None:
+        """Restore a snapshot made by `dump`"""
+        for name, (last, *counts) in data.items():
+            ring = self.rings.get(name)
+            if ring is not None and len(counts) == ring.size:
+                ring.last = last
+                ring.counts = array("I", counts)
+
+
+class Activity:
+    """Commands activity timelines, everywhere and per guild
+
+    Only the guilds active the most recently are kept,
+    at most `max_guilds` of them.
+
+    Attributes
+    ----------
+    everywhere : ActivityTimeline
+        Activity of every guild and user installed command
+    guilds : OrderedDict[int, ActivityTimeline]
+        Activity by guild, least recently active first
+    max_guilds : int
+        Guilds kept at most
+    """
+
+    def __init__(self, *, max_guilds: int = 5000) -> None:
+        self.max_guilds = max_guilds
+        self.everywhere = ActivityTimeline()
+        self.guilds: OrderedDict[int, ActivityTimeline] = OrderedDict()
+
+    def add(self, guild_id: int | None, timestamp: float) -> None:
+        """Count a command completed at a unix time"""
+        self.everywhere.add(timestamp)
+        if guild_id is None:
+            return
+        self.__guild(guild_id).add(timestamp)
+
+    def of(self, guild_id: int | None) -> ActivityTimeline | None:
+        """The activity of a guild, or everywhere if `None`"""
+        if guild_id is None:
+            return self.everywhere
+        return self.guilds.get(guild_id)
+
+    def dump(self) -> dict[str, dict[str, list[int]]]:
+        """Snapshot the timelines, in a JSON serializable format"""
+        data = {
+            str(guild_id): timeline.dump()
+            for guild_id, timeline in self.guilds.items()
+        }
+        data["everywhere"] = self.everywhere.dump()
+        return data
+
+    def load(self, data: dict[str, dict[str, list[int]]]) -> None:
+        """Restore a snapshot made by `dump`"""
+        for key, timeline in data.items():
+            if key == "everywhere":
+                self.everywhere.load(timeline)
+            else:
+                self.__guild(int(key)).load(timeline)
+
+    def __guild(self, guild_id: int) -> ActivityTimeline:
+        timeline = self.guilds.get(guild_id)
+        if timeline is None:
+            timeline = self.guilds[guild_id] = ActivityTimeline()
+            while len(self.guilds) > self.max_guilds:
+                self.guilds.popitem(last=False)
+        else:
+            self.guilds.move_to_end(guild_id)
+        return timeline
@@ -14,12 +14,15 @@ limitations under the License.
 
 from __future__ import annotations
 
+import importlib.util
 import logging
 import logging.handlers
 import pathlib
 import re
+import sys
+from time import perf_counter
 from typing import TYPE_CHECKING
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlsplit
 
 from discord import ButtonStyle, ui
 
@@ -27,10 +30,13 @@ from discord import ButtonStyle, ui
 # so i will just import everything from discord.utils
 from discord.utils import *  # type: ignore[wildcardImportFromLibrary]
 
+from core.metrics import HTTP_REQUEST_DURATION
 from core.settings import CROSS
 from core.views import PaginatedLayoutView
 
 if TYPE_CHECKING:
+    from types import ModuleType
+
     from aiohttp import ClientSession
 
 
@@ -78,6 +84,36 @@ class LogFormatter(logging.Formatter):
         return formatter.format(record)
 
 
+def lazy_import(name: str) -> ModuleType:
+    """Import a module that only gets executed on first attribute access
+
+    Used for heavy dependencies that only a few commands need,
+    so they don't slow down the startup or take memory when unused.
+
+    Parameters
+    ----------
+    name : str
+        Fully qualified name of the module
+
+    Returns
+    -------
+    ModuleType
+        The module, loaded once any attribute of it is accessed
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        msg = f"No module named {name!r}"
+        raise ModuleNotFoundError(msg, name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
 def setup_logging() -> None:
     """Setup logging for the bot
 
@@ -139,10 +175,18 @@ async def request(
         The first value contains the return code.
         The second value contains the data
     """
-    async with cs.get(url + query) as response:
-        code = response.status
-        data = await response.json()
-        return code, data
+    start = perf_counter()
+    status = "error"
+    try:
+        async with cs.get(url + query) as response:
+            code = response.status
+            status = str(code)
+            data = await response.json()
+            return code, data
+    finally:
+        HTTP_REQUEST_DURATION.observe(
+            urlsplit(url).hostname or "", status, value=perf_counter() - start
+        )
 
 
 async def call_dictionary(word: str, cs: ClientSession) -> PaginatedLayoutView:
@@ -14,7 +14,7 @@ limitations under the License.
 
 from __future__ import annotations
 
-from .base import LayoutView as LayoutView
+from .base import LayoutView as LayoutView, Modal as Modal
 from .paginated import (
     PaginatedLayoutView as PaginatedLayoutView,
     PaginatedView as PaginatedView,
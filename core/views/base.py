@@ -14,7 +14,7 @@ limitations under the License.
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
 from discord import Interaction, Member, Message, User, ui
 from discord.ext.commands import CooldownMapping
@@ -22,6 +22,8 @@ from discord.ext.commands import CooldownMapping
 from .errors import UIElementOnCoolDownError
 
 if TYPE_CHECKING:
+    from core import FurinaBot
+
     from .container import Container
 
 
@@ -55,6 +57,13 @@ class View(ui.View):
         else:
             await super().on_error(interaction, error, item)
 
+    async def _scheduled_task(
+        self, item: ui.Item, interaction: Interaction[FurinaBot]
+    ) -> None:
+        # components are user-facing, background REST calls wait for them
+        with interaction.client.rest.interactive():
+            await super()._scheduled_task(item, interaction)
+
     async def on_timeout(self) -> None:
         for child in self.children:
             if isinstance(child, ui.Button) and child.url:
@@ -99,6 +108,13 @@ class LayoutView(ui.LayoutView):
         else:
             await super().on_error(interaction, error, item)
 
+    async def _scheduled_task(
+        self, item: ui.Item, interaction: Interaction[FurinaBot]
+    ) -> None:
+        # components are user-facing, background REST calls wait for them
+        with interaction.client.rest.interactive():
+            await super()._scheduled_task(item, interaction)
+
     async def on_timeout(self) -> None:
         for child in self.walk_children():
             if isinstance(child, ui.Button) and child.url:
@@ -108,3 +124,13 @@ class LayoutView(ui.LayoutView):
             await self.message.edit(view=self)
         except AttributeError:
             pass
+
+
+class Modal(ui.Modal):
+    """A `ui.Modal` whose submissions hold off background REST calls"""
+
+    async def _scheduled_task(
+        self, interaction: Interaction[FurinaBot], *args: Any
+    ) -> None:
+        with interaction.client.rest.interactive():
+            await super()._scheduled_task(interaction, *args)